@@ -1368,21 +1368,43 @@ async def download_single_episode(client: Client, callback_query):
         f"⏳ Extracting download link..."
     )
     
-    async def progress_callback(message):
+    loop = asyncio.get_running_loop()
+    last_edit = {'text': None, 'time': 0, 'pending': None}
+    
+    async def edit_progress(text):
         try:
-            await status_msg.edit_text(
-                f"📥 **Downloading Episode**\n\n"
-                f"**Episode:** {selected_episode['display_title']}\n"
-                f"{message}"
-            )
+            await status_msg.edit_text(text)
         except:
             pass
     
+    def progress_callback(message):
+        # Called from the download thread: coalesce and hand the edit to the loop
+        text = (
+            f"📥 **Downloading Episode**\n\n"
+            f"**Episode:** {selected_episode['display_title']}\n"
+            f"{message}"
+        )
+        now = time.monotonic()
+        if text == last_edit['text']:
+            return
+        if now - last_edit['time'] < 5:
+            # Shown once the download returns, unless a later update wins
+            last_edit['pending'] = text
+            return
+        last_edit.update(text=text, time=now, pending=None)
+        asyncio.run_coroutine_threadsafe(edit_progress(text), loop)
+    
     max_retries = 3
     attempt = 0
     
     while attempt < max_retries:
-        result = scraper.extract_and_download(selected_episode['download_link'], progress_callback)
+        result = await asyncio.to_thread(scraper.extract_and_download, selected_episode['download_link'], progress_callback)
+        
+        # The last update may have fallen inside the throttle window
+        pending = last_edit['pending']
+        if pending and pending != last_edit['text']:
+            last_edit.update(text=pending, time=time.monotonic(), pending=None)
+            await edit_progress(pending)
         
         if result and result.get('success'):
             break
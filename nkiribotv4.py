@@ -1,18 +1,50 @@
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+try:
+    from bs4.filter import ElementFilter  # bs4 >= 4.13
+except ImportError:
+    ElementFilter = None
 import time
 import os
 import re
 from pyrogram import utils
+from pyrogram import raw, types
 from pyrogram import Client, filters
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton, Message
+from pyrogram.errors import FloodWait, FilePartMissing
+from pyrogram.session import Session
 import asyncio
+import math
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+import shutil
+import threading
+from collections import deque
+from contextvars import ContextVar
 from typing import Dict, List
 import random
 import subprocess
 import urllib3
 import json
+import html
+import functools
+import multiprocessing
+import hashlib
+import errno
+import socket
 from datetime import datetime
+from urllib.parse import urlparse, urljoin
+
+# Optional fast HTML parsers (see HTML_PARSER)
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+try:
+    import lxml.html
+    from lxml.cssselect import CSSSelector
+except ImportError:
+    CSSSelector = None
 
 # Disable SSL warnings
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -28,6 +60,118 @@ DOWNLOAD_PATH = "./downloads/"
 THUMBNAIL_PATH = "./thumbnails/"
 MONITOR_FILE = "./monitor_data.json"
 
+# Private channel used as the upload origin when an episode goes to several
+# chats (bot must be admin). None uploads to the first destination instead.
+STORAGE_CHANNEL_ID = None
+
+# Archive mode: every episode is uploaded to STORAGE_CHANNEL_ID first and
+# later requests are served from there with copy_message
+ARCHIVE_MODE = False
+ARCHIVE_INDEX_FILE = "./archive_index.json"
+
+# Helper bots that take over uploads (into STORAGE_CHANNEL_ID, where they
+# must be admins); the main bot then only delivers. Empty = main bot uploads.
+HELPER_BOT_TOKENS: List[str] = []
+
+# User IDs allowed to run maintenance commands like /rebuildarchive
+ADMIN_IDS: List[int] = []
+
+# Failed uploads keep their file here so a retry skips the download
+UPLOAD_RETRY_PATH = "./downloads/retry/"
+UPLOAD_RETRY_FILE = "./upload_retry.json"
+UPLOAD_RETRY_TTL = 6 * 3600  # seconds a parked file is kept
+UPLOAD_MAX_ATTEMPTS = 4
+
+# Finished downloads stay on disk, deduplicated by content hash, so repeat
+# requests skip the download; least recently used files go first once the
+# store exceeds its byte budget. 0 disables the store.
+DOWNLOAD_STORE_PATH = "./downloads/store/"
+DOWNLOAD_STORE_INDEX = "./download_store.json"
+DOWNLOAD_STORE_BUDGET = 20 * 1024 * 1024 * 1024
+
+# Download write path: reads go into one reusable buffer whose size adapts
+# between the bounds so one read takes about DOWNLOAD_READ_TARGET seconds.
+# Reads never exceed DOWNLOAD_MIN_SPEED * DOWNLOAD_STALL_WINDOW / 4 bytes, so
+# the stall watchdog sees progress from a slow but healthy transfer.
+DOWNLOAD_MIN_CHUNK = 1024 * 1024
+DOWNLOAD_MAX_CHUNK = 8 * 1024 * 1024
+DOWNLOAD_READ_TARGET = 0.5
+DOWNLOAD_FSYNC = "end"  # "none", "end" or "periodic"
+DOWNLOAD_FSYNC_BYTES = 256 * 1024 * 1024  # fsync interval for "periodic"
+DOWNLOAD_SNIFF_BYTES = 4096  # first read, checked for a video container
+DOWNLOAD_HASH = False  # SHA-256 every download (always on with the store)
+
+# Stall watchdog: a download slower than DOWNLOAD_MIN_SPEED (bytes/s) over
+# DOWNLOAD_STALL_WINDOW seconds is cut off and resumed with a Range request
+DOWNLOAD_MIN_SPEED = 64 * 1024
+DOWNLOAD_STALL_WINDOW = 60
+DOWNLOAD_MAX_RESUMES = 5
+
+# Mirror racing: episodes with several download buttons resolve them in
+# parallel, then the direct links are probed and the fastest one is used
+MIRROR_RACE_GRACE = 15  # seconds other mirrors get after the first resolves
+MIRROR_PROBE_BYTES = 256 * 1024  # ranged read used to measure each mirror
+MIRROR_PROBE_TIMEOUT = 15
+
+# Batch pipeline: file host countdowns of upcoming episodes are waited out
+# concurrently, each on its own HTTP session, and resolved episodes feed a
+# separate, smaller download stage
+RESOLVE_WORKERS = 8  # episodes resolving (or resolved and waiting) at once
+BATCH_DOWNLOADS = 2  # episodes downloading at once across all batches
+
+# Speculative resolution: opening a season menu starts resolving its first
+# episodes and a finished episode starts the next one, so a click can go
+# straight to the download. SPECULATIVE_BUDGET bounds how many of a user's
+# speculative resolutions run or wait unclaimed at once (0 disables).
+SPECULATIVE_BUDGET = 3
+RESOLVED_LINK_TTL = 600  # seconds a resolved link is kept when its host declares no TTL
+
+# Search prefetch: the top results' episode lists are fetched while the user
+# is choosing; unpicked ones are dropped on selection or after PREFETCH_TTL
+SEARCH_PREFETCH = 2  # results prefetched per search (1-3, 0 disables)
+PREFETCH_TTL = 120
+
+# Disk admission: a download reserves its Content-Length before writing and
+# holds it until its job is done; jobs that don't fit wait in order
+DISK_BUDGET = 0  # max bytes reserved at once, 0 = limited by free space only
+DISK_FREE_MARGIN = 1024 * 1024 * 1024  # always leave this much free
+DISK_UNKNOWN_SIZE = 1536 * 1024 * 1024  # reserved when Content-Length is missing
+
+# Outbound pacing (Telegram bot limits)
+SEND_GLOBAL_RATE = 25  # messages per second across all chats
+SEND_PRIVATE_INTERVAL = 1.0  # seconds between messages to one user
+SEND_GROUP_INTERVAL = 3.0  # seconds between messages to one group/channel
+SEND_MAX_FLOOD_RETRIES = 3
+
+PROGRESS_EDIT_INTERVAL = 5  # seconds between edits of one status message
+
+# Files above the bot upload limit are split before upload
+TELEGRAM_UPLOAD_LIMIT = 2000 * 1024 * 1024
+SPLIT_PART_SIZE = 1900 * 1024 * 1024  # headroom for keyframe drift
+MEDIA_WORKERS = 2  # concurrent ffmpeg/ffprobe jobs
+MAX_CONCURRENT_UPLOADS = 3
+MAX_PART_REUPLOADS = 3  # times missing parts are re-sent before sending fails
+
+# Parallel upload engine: parts of one file go out over several MTProto
+# media sessions; the worker count adapts to measured throughput
+UPLOAD_SESSIONS = 4
+UPLOAD_MIN_WORKERS = 4
+UPLOAD_MAX_WORKERS = 16
+UPLOAD_ADAPT_INTERVAL = 5  # seconds between throughput measurements
+STREAMING_UPLOAD = True  # upload parts while the download is still running
+
+# HTML parser backend: "selectolax", "lxml", "bs4" or "auto" (fastest installed)
+HTML_PARSER = "auto"
+PARSE_WORKERS = 2  # processes parsing pages off the event loop, 0 = inline
+SELECTOR_STATS_FILE = "./selector_stats.json"  # per-host hit counts of extraction strategies
+
+# File host countdowns: the form is first posted COUNTDOWN_GRACE seconds after
+# a probe wait learned per host (between the longest rejected and shortest
+# accepted wait, at most the page's countdown); if that early post is
+# rejected it is sent again once the countdown has passed
+COUNTDOWN_GRACE = 0.5
+COUNTDOWN_STATS_FILE = "./countdown_stats.json"
+
    
 def get_peer_type_new(peer_id: int) -> str:
     peer_id_str = str(peer_id)
@@ -41,109 +185,270 @@ def get_peer_type_new(peer_id: int) -> str:
 utils.get_peer_type = get_peer_type_new
 
 # ============================================================================
-# Drama Scraper Class
+# HTML Parsing
 # ============================================================================
-class DramaEpisodeScraper:
+# All scraping code works on these small node wrappers (CSS selection,
+# attributes, text), so any backend can parse the pages
+class SoupNode:
+    """BeautifulSoup element"""
+    __slots__ = ('element',)
+
+    def __init__(self, element):
+        self.element = element
+
+    @property
+    def tag(self):
+        return self.element.name
+
+    def get(self, name, default=None):
+        value = self.element.get(name, default)
+        # bs4 splits multi-valued attributes like class
+        return ' '.join(value) if isinstance(value, list) else value
+
+    def text(self, strip=False):
+        return self.element.get_text(strip=strip)
+
+    def select(self, css):
+        return [SoupNode(element) for element in self.element.select(css)]
+
+    def select_one(self, css):
+        element = self.element.select_one(css)
+        return SoupNode(element) if element is not None else None
+
+class LexborNode:
+    """selectolax (lexbor) node - C parser and C selector engine"""
+    __slots__ = ('element',)
+
+    def __init__(self, element):
+        self.element = element
+
+    @property
+    def tag(self):
+        return self.element.tag
+
+    def get(self, name, default=None):
+        value = self.element.attributes.get(name)
+        return default if value is None else value
+
+    def text(self, strip=False):
+        return self.element.text(deep=True, separator='', strip=strip)
+
+    def select(self, css):
+        return [LexborNode(element) for element in self.element.css(css)]
+
+    def select_one(self, css):
+        element = self.element.css_first(css)
+        return LexborNode(element) if element is not None else None
+
+@functools.lru_cache(maxsize=128)
+def compile_css(css):
+    """CSS selector compiled to lxml XPath, cached per selector"""
+    return CSSSelector(css)
+
+class LxmlNode:
+    """lxml element - C parser, CSS compiled to XPath"""
+    __slots__ = ('element',)
+
+    def __init__(self, element):
+        self.element = element
+
+    @property
+    def tag(self):
+        return self.element.tag
+
+    def get(self, name, default=None):
+        return self.element.get(name, default)
+
+    def text(self, strip=False):
+        # Same result as bs4's get_text(strip=True): strings stripped and joined
+        if strip:
+            return ''.join(string.strip() for string in self.element.itertext())
+        return ''.join(self.element.itertext())
+
+    def select(self, css):
+        return [LxmlNode(element) for element in compile_css(css)(self.element)]
+
+    def select_one(self, css):
+        found = compile_css(css)(self.element)
+        return LxmlNode(found[0]) if found else None
+
+class ParseScope:
     """
-    Scrapes drama episodes from thenkiri.com website.
-    Handles search, episode extraction, and video file downloads.
+    The part of a page an extraction routine needs: elements matching by
+    tag, class or id substring are kept with their whole subtree.
+    Only the bs4 backend applies it (as a parse_only filter), and it saves
+    little there (about 1.2x in parser_benchmark.py); the speedup comes
+    from the C backends, which always parse the whole page.
     """
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:145.0) Gecko/20100101 Firefox/145.0',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-        })
-        self.session.verify = False
-        self.base_url = "https://thenkiri.com"
-        os.makedirs(DOWNLOAD_PATH, exist_ok=True)
-        os.makedirs(THUMBNAIL_PATH, exist_ok=True)
+    def __init__(self, tags=(), classes=(), id_parts=()):
+        self.tags = frozenset(tags)
+        self.classes = frozenset(classes)
+        self.id_parts = tuple(id_parts)
+
+    def keeps(self, name, attrs):
+        if name in self.tags:
+            return True
+        classes = attrs.get('class') or ''
+        if isinstance(classes, str):
+            classes = classes.split()
+        if self.classes.intersection(classes):
+            return True
+        element_id = attrs.get('id') or ''
+        return any(part in element_id for part in self.id_parts)
+
+    def strainer(self):
+        """bs4 parse_only filter for this scope"""
+        scope = self
+        if ElementFilter is not None:
+            class ScopeFilter(ElementFilter):
+                def allow_tag_creation(self, nsprefix, name, attrs):
+                    return scope.keeps(name, attrs or {})
+                
+                def allow_string_creation(self, string):
+                    return False
+            
+            return ScopeFilter()
+        # Older bs4 calls a SoupStrainer function with the tag name and attrs
+        return SoupStrainer(lambda name, attrs: scope.keeps(name, dict(attrs)))
+
+# Scopes of the extraction routines
+SEARCH_SCOPE = ParseScope(tags=['article', 'h2', 'h3'], classes=['post', 'search-result', 'movie-item', 'drama-item'])
+EPISODE_PAGE_SCOPE = ParseScope(classes=['elementor-container', 'elementor-button'])
+FORM_PAGE_SCOPE = ParseScope(tags=['form', 'script', 'span'], classes=['countdown', 'timer'], id_parts=['count', 'wait'])
+DOWNLOAD_LINK_SCOPE = ParseScope(tags=['a', 'button', 'script'])
+
+def available_html_backends():
+    """Installed parser backends, fastest first"""
+    backends = []
+    if LexborHTMLParser is not None:
+        backends.append('selectolax')
+    if CSSSelector is not None:
+        backends.append('lxml')
+    backends.append('bs4')
+    return backends
+
+def parse_html(content, backend=None, scope=None):
+    """
+    Parse an HTML page with the configured (or given) backend.
+    A scope limits the bs4 tree to what the caller needs. The C backends
+    ignore it and build the full tree: their whole-page parse is already
+    an order of magnitude faster, and filtering every element in Python
+    would cost more than it saves.
+    
+    Args:
+        content (bytes): Raw page
+        backend (str): Backend override, see HTML_PARSER
+        scope (ParseScope): Part of the page the caller reads
         
-    def search_drama(self, search_term):
+    Returns:
+        Root node supporting select/select_one/get/text/tag
+    """
+    backend = backend or HTML_BACKEND
+    if backend == 'selectolax':
+        return LexborNode(LexborHTMLParser(content).root)
+    if backend == 'lxml':
+        try:
+            return LxmlNode(lxml.html.document_fromstring(content))
+        except lxml.etree.ParserError:
+            # Empty or whitespace-only page
+            return LxmlNode(lxml.html.document_fromstring(b"<html></html>"))
+    parse_only = scope.strainer() if scope else None
+    return SoupNode(BeautifulSoup(content, 'html.parser', parse_only=parse_only))
+
+HTML_BACKEND = available_html_backends()[0] if HTML_PARSER == "auto" else HTML_PARSER
+
+def find_first(nodes, attribute, pattern):
+    """First node whose attribute (or text, for attribute=None) matches a regex"""
+    for node in nodes:
+        value = node.text() if attribute is None else node.get(attribute)
+        if value and pattern.search(value):
+            return node
+    return None
+
+class DramaPageParser:
+    """
+    Extracts plain data from parsed pages.
+    Holds no network state, so it also runs inside the parse pool.
+    """
+    # Strategy chains in tiers, most specific first. Selector stats only
+    # reorder strategies within a tier, so a generic fallback never jumps
+    # ahead of a specific match.
+    SEARCH_TIERS = [
+        ['article', '.post', '.search-result', '.movie-item', '.drama-item'],
+        ['h2 a', 'h3 a'],
+    ]
+    SEARCH_SELECTORS = [selector for tier in SEARCH_TIERS for selector in tier]
+    COUNTDOWN_TIERS = [
+        ['span.seconds', '#countdown', '.countdown'],
+        ['span[id*="count"]', 'div[id*="wait"]', '.timer'],
+        ['script'],
+    ]
+    COUNTDOWN_STRATEGIES = [name for tier in COUNTDOWN_TIERS for name in tier]
+    # Timer variables in page scripts (seconds). setTimeout delays are not
+    # used: in countdown loops they are the 1000 ms tick, not the wait.
+    SCRIPT_TIMER_PATTERN = re.compile(
+        r'\b(?:var|let|const)\s+(?:count(?:down)?|cdown|seconds?|secs|timer|time_?left|wait(?:_?time)?)\s*=\s*(\d+(?:\.\d+)?)\s*[;,\n]', re.I
+    )
+    DOWNLOAD_LINK_TIERS = [
+        ['a[id~download]', 'a[class~download]'],
+        ['a:text~download'],
+        ['a[href=video]', 'a[href=server]', 'a[href=path]'],
+        ['button[onclick]'],
+        ['script:video', 'script:server'],
+        ['script:redirect'],
+    ]
+    DOWNLOAD_LINK_STRATEGIES = [name for tier in DOWNLOAD_LINK_TIERS for name in tier]
+    
+    def extract_search_results(self, soup, order=None):
         """
-        Search for drama on the website.
+        Extract search results from the page.
+        Selectors are tried in the given order (best first) until one matches.
         
-        Args:
-            search_term (str): Drama name to search for
-            
         Returns:
-            list: List of search results with title and URL
+            tuple: (results, selector that matched or None)
         """
-        try:
-            search_url = f"{self.base_url}/?s={search_term}"
-            response = self.session.get(search_url, verify=False)
-            
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.content, 'html.parser')
-                return self.extract_search_results(soup)
-            return []
-        except Exception as e:
-            print(f"Error searching: {e}")
-            return []
-    
-    def extract_search_results(self, soup):
-        """Extract search results from the page"""
-        results = []
-        selectors = ['article', '.post', '.search-result', '.movie-item', '.drama-item', 'h2 a', 'h3 a']
-        
-        for selector in selectors:
+        for selector in order or self.SEARCH_SELECTORS:
             items = soup.select(selector)
             if items:
+                results = []
                 for i, item in enumerate(items, 1):
-                    link_element = item if item.name == 'a' else item.find('a')
+                    link_element = item if item.tag == 'a' else item.select_one('a')
                     if link_element and link_element.get('href'):
-                        title_element = item.find(['h1', 'h2', 'h3', 'h4']) or link_element
-                        title = title_element.get_text(strip=True) if title_element else "Unknown Title"
+                        title_element = item.select_one('h1, h2, h3, h4') or link_element
+                        title = title_element.text(strip=True) if title_element else "Unknown Title"
                         
                         results.append({
                             'number': i,
                             'title': title,
                             'url': link_element.get('href')
                         })
-                break
-        return results
+                return results, selector
+        return [], None
     
-    def scrape_episodes(self, drama_url):
-        """
-        Scrape episodes from the selected drama page.
-        
-        Args:
-            drama_url (str): URL of the drama page
-            
-        Returns:
-            dict: Dictionary organized by season containing episode lists
-        """
-        try:
-            response = self.session.get(drama_url, verify=False)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            seasons = self.parse_elementor_episodes_by_season(soup)
-
-            # Fallback to movie if no episodes found
-            if not seasons or all(len(eps) == 0 for eps in seasons.values()):
-                movie = self.extract_movie_download(soup)
-                if movie:
-                    return {"Movie": [movie]}
-            return seasons
-        except Exception as e:
-            print(f"Error scraping episodes: {e}")
-            return {}
-
     def extract_movie_download(self, soup):
         """Fallback: detect single movie download button."""
-        btn = soup.find('a', class_='elementor-button')
-        if not btn or not btn.get('href'):
+        links = self.collect_download_links(soup)
+        if not links:
             return None
         
         return {
             'number': 1,
             'title': "Movie Download",
-            'download_link': btn.get('href'),
+            'download_link': links[0],
+            'download_links': links,
             'season': "Movie"
         }
     
+    def collect_download_links(self, element):
+        """
+        All download button links inside an element, first one first.
+        
+        Returns:
+            list: Unique hrefs of a.elementor-button elements
+        """
+        links = [btn.get('href') for btn in element.select('a.elementor-button') if btn.get('href')]
+        return list(dict.fromkeys(links))
+    
     def parse_elementor_episodes_by_season(self, soup):
         """
         Parse episodes with proper season detection from Elementor containers.
@@ -155,13 +460,13 @@ class DramaEpisodeScraper:
         current_season = None
         detected_season_numbers = []
         
-        containers = soup.find_all('div', class_='elementor-container elementor-column-gap-default')
+        containers = soup.select('div[class="elementor-container elementor-column-gap-default"]')
         
         for container in containers:
-            headings = container.find_all('h2', class_='elementor-heading-title')
+            headings = container.select('h2.elementor-heading-title')
             
             for heading in headings:
-                heading_text = heading.get_text(strip=True)
+                heading_text = heading.text(strip=True)
                 
                 # Check if this is a season heading
                 season_match = re.search(r'season\s+(\d+)', heading_text, re.IGNORECASE)
@@ -181,14 +486,15 @@ class DramaEpisodeScraper:
                     if current_season not in seasons:
                         seasons[current_season] = []
                     
-                    download_button = container.find('a', class_='elementor-button')
-                    if download_button and download_button.get('href'):
+                    download_links = self.collect_download_links(container)
+                    if download_links:
                         episode_number = len(seasons[current_season]) + 1
                         
                         seasons[current_season].append({
                             'number': episode_number,
                             'title': heading_text,
-                            'download_link': download_button.get('href'),
+                            'download_link': download_links[0],
+                            'download_links': download_links,
                             'season': current_season
                         })
         
@@ -201,420 +507,2073 @@ class DramaEpisodeScraper:
         min_season = min(detected_season_numbers)
         return f"Season {min_season}"
     
-    def is_direct_video_file(self, url):
+    def extract_download_form(self, soup, countdown_order=None):
         """
-        Check if URL points to an actual video file by checking Content-Type.
+        Find the file host's download form and its countdown.
         
         Args:
-            url (str): URL to check
-            
+            soup: Parsed file host page
+            countdown_order (list): COUNTDOWN_STRATEGIES, best first
+        
         Returns:
-            bool: True if URL is a direct video file
+            dict: 'fields' (hidden/submit inputs), 'wait_time' (seconds,
+            0 if no countdown was found) and 'strategy' (the countdown
+            strategy that matched), or None without a form
         """
-        try:
-            print(f"Checking if direct video: {url}")
-            
-            video_extensions = ['.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.webm', '.m4v']
-            url_lower = url.lower()
-            
-            has_video_extension = any(ext in url_lower for ext in video_extensions)
-            
-            if not has_video_extension:
-                print(f"No video extension in URL")
-                return False
-            
-            # Check Content-Type header
-            head_response = self.session.head(url, verify=False, timeout=10, allow_redirects=True)
-            content_type = head_response.headers.get('Content-Type', '').lower()
-            content_length = head_response.headers.get('Content-Length', '0')
-            
-            print(f"Content-Type: {content_type}")
-            print(f"Content-Length: {content_length}")
-            
-            is_video = any(vid_type in content_type for vid_type in ['video/', 'application/octet-stream'])
-            is_large = int(content_length) > 1000000  # > 1MB
+        form = (soup.select_one('form[name="F1"]') or 
+               soup.select_one('form#downloadform') or 
+               find_first(soup.select('form[action]'), 'action', re.compile(r'downloadwella|dl')) or
+               soup.select_one('form'))
+        
+        if not form:
+            return None
+        
+        # Extract hidden form fields
+        fields = {}
+        for input_field in form.select('input'):
+            input_type = input_field.get('type', '').lower()
+            name = input_field.get('name')
+            value = input_field.get('value', '')
             
-            if is_video and is_large:
-                print(f"✅ Confirmed direct video file")
-                return True
-            else:
-                print(f"❌ Not a video file (probably HTML page)")
-                return False
-                
-        except Exception as e:
-            print(f"Error checking video file: {e}")
-            return False
+            if name and input_type in ['hidden', 'submit']:
+                fields[name] = value
+        
+        wait_time, strategy = 0, None
+        for name in countdown_order or self.COUNTDOWN_STRATEGIES:
+            wait_time = self.find_countdown(soup, name)
+            if wait_time:
+                strategy = name
+                break
+        
+        return {'fields': fields, 'wait_time': wait_time, 'strategy': strategy}
     
-    def download_direct_video(self, url, progress_callback=None):
+    def find_countdown(self, soup, strategy):
         """
-        Download video file directly from URL with retry mechanism.
+        Countdown seconds found by one strategy: a CSS selector, or 'script'
+        for the timer variable in the page's scripts.
         
-        Args:
-            url (str): Direct video file URL
-            progress_callback (callable): Function to call with progress updates
-            
         Returns:
-            dict: Download result with success status, filepath, and file info
+            int: Seconds, or 0 if the strategy found nothing
         """
-        max_retries = 3
-        
-        for attempt in range(max_retries):
-            try:
-                if progress_callback:
-                    if attempt > 0:
-                        progress_callback(f"📥 Retry attempt {attempt + 1}...")
-                    else:
-                        progress_callback("📥 Direct video download...")
-                
-                # Extract filename from URL
-                filename = url.split('/')[-1].split('?')[0]
-                if not filename or '.' not in filename:
-                    filename = f"video_{int(time.time())}.mkv"
-                
-                filename = re.sub(r'[^\w\-_\.]', '_', filename)
-                
-                # Handle duplicate filenames
-                base_name, ext = os.path.splitext(filename)
-                counter = 1
-                while os.path.exists(os.path.join(DOWNLOAD_PATH, filename)):
-                    filename = f"{base_name}_{counter}{ext}"
-                    counter += 1
-                
-                filepath = os.path.join(DOWNLOAD_PATH, filename)
-                
-                if progress_callback:
-                    progress_callback(f"📥 Downloading: {filename}")
-                
-                print(f"Downloading direct video (attempt {attempt + 1}): {url}")
-                
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-                    'Accept': '*/*',
-                    'Connection': 'keep-alive',
-                }
-                
-                response = self.session.get(url, headers=headers, stream=True, verify=False, timeout=60)
-                response.raise_for_status()
-                
-                total_size = int(response.headers.get('Content-Length', 0))
-                
-                # Download with progress tracking
-                with open(filepath, 'wb') as f:
-                    downloaded = 0
-                    last_progress = 0
-                    
-                    for chunk in response.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
-                            downloaded += len(chunk)
-                            
-                            if total_size > 0 and progress_callback:
-                                progress = (downloaded / total_size) * 100
-                                if int(progress) // 10 > last_progress // 10:
-                                    progress_callback(f"📥 Progress: {progress:.1f}%")
-                                    last_progress = progress
-                
-                file_size = os.path.getsize(filepath) / (1024 * 1024)  # MB
-                
-                print(f"✅ Direct download successful: {filename} ({file_size:.2f} MB)")
-                
-                return {
-                    'success': True,
-                    'filepath': filepath,
-                    'filename': filename,
-                    'size_mb': file_size
-                }
-                
-            except Exception as e:
-                print(f"Download attempt {attempt + 1} failed: {e}")
-                
-                # Clean up partial download
-                if 'filepath' in locals() and os.path.exists(filepath):
-                    try:
-                        os.remove(filepath)
-                    except:
-                        pass
-                
-                if attempt < max_retries - 1:
-                    time.sleep(3 * (attempt + 1))  # Exponential backoff
-                    continue
-                
-                return {
-                    'success': False,
-                    'error': str(e),
-                    'attempts': max_retries
-                }
+        if strategy != 'script':
+            countdown = soup.select_one(strategy)
+            if countdown:
+                numbers = re.findall(r'\d+', countdown.text())
+                if numbers:
+                    return int(numbers[0])
+            return 0
         
-        return None
+        for script in soup.select('script'):
+            match = self.SCRIPT_TIMER_PATTERN.search(script.text())
+            if match:
+                return math.ceil(float(match.group(1)))
+        return 0
     
-    def extract_and_download(self, page_url, progress_callback=None):
+    def extract_download_link(self, soup, order=None):
         """
-        Smart download handler that detects if URL is direct video or file host page.
-        Extracts download link from file host if needed, then downloads the video.
+        Find the video link in the page returned by the download form.
+        Strategies run lazily in the given order (best first) and stop at
+        the first link found.
         
         Args:
-            page_url (str): URL to download from
-            progress_callback (callable): Function for progress updates
-            
+            soup: Parsed form response
+            order (list): DOWNLOAD_LINK_STRATEGIES, best first
+        
         Returns:
-            dict: Download result with success status and file info
+            tuple: (link as found on the page, possibly relative, or None;
+            strategy that found it or None)
         """
+        for name in order or self.DOWNLOAD_LINK_STRATEGIES:
+            link = self.find_download_link(soup, name)
+            if link:
+                return link, name
+        return None, None
+    
+    def find_download_link(self, soup, strategy):
+        """
+        Video link found by one strategy.
         
-        print(f"\n{'='*60}")
-        print(f"Processing URL: {page_url}")
-        print(f"{'='*60}")
+        Returns:
+            str: Link, or None
+        """
+        link_patterns = {
+            'a[id~download]': ('id', re.compile(r'download', re.I)),
+            'a[class~download]': ('class', re.compile(r'download', re.I)),
+            'a:text~download': (None, re.compile(r'download', re.I)),
+            'a[href=video]': ('href', re.compile(r'\.(mp4|mkv|avi|mov|wmv|flv|webm)', re.I)),
+            'a[href=server]': ('href', re.compile(r'nkiserv\.com|cdn\.|storage\.|files/', re.I)),
+            'a[href=path]': ('href', re.compile(r'/d/|/download/|/file/', re.I)),
+        }
+        if strategy in link_patterns:
+            attribute, pattern = link_patterns[strategy]
+            link = find_first(soup.select('a'), attribute, pattern)
+            return link.get('href') if link else None
         
-        # Check if it's a direct video file
-        if self.is_direct_video_file(page_url):
-            print("✅ Direct video file detected - downloading...")
-            return self.download_direct_video(page_url, progress_callback)
+        if strategy == 'button[onclick]':
+            button = find_first(soup.select('button'), 'onclick', re.compile(r'download|location', re.I))
+            if button:
+                url_match = re.search(r"['\"](https?://[^'\"]+)['\"]", button.get('onclick'))
+                if url_match:
+                    return url_match.group(1)
+            return None
         
-        print("📄 File host page detected - extracting download link...")
+        # JavaScript fallbacks
+        script_patterns = {
+            'script:video': r'["\']https?://[^"\']*\.(?:mp4|mkv|avi|mov|wmv)[^"\']*["\']',
+            'script:server': r'["\']https?://[^"\']*(?:nkiserv|cdn|storage|files)[^"\']*["\']',
+            'script:redirect': r'location\.(?:href|replace)\s*[=\(]\s*["\']([^"\']+)["\']',
+        }
+        for script in soup.select('script'):
+            match = re.search(script_patterns[strategy], script.text(), re.I)
+            if match:
+                return (match.group(1) if match.groups() else match.group(0)).strip('"\'')
+        return None
+
+# ============================================================================
+# Extraction Strategy Stats
+# ============================================================================
+class StrategyStats:
+    """
+    Per-host hit counts of extraction strategies (selectors and patterns).
+    Within each specificity tier of a chain, strategies are tried by
+    smoothed hit rate, so the usual page costs few evaluations while the
+    specific-before-generic order (and so the result) stays the same.
+    Counting happens in the main process, because parsing runs in the
+    parse pool. The file is written at most every save_interval seconds.
+    """
+    def __init__(self, stats_file, save_interval=30):
+        self.stats_file = stats_file
+        self.save_interval = save_interval
+        self.stats: Dict[str, Dict] = {}
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.saved_at = 0
+
+    def load(self):
+        try:
+            if os.path.exists(self.stats_file):
+                with open(self.stats_file, 'r') as f:
+                    self.stats = json.load(f)
+        except Exception as e:
+            print(f"Error loading selector stats: {e}")
+            self.stats = {}
+
+    def save(self):
+        with self.lock:
+            data = json.dumps(self.stats, indent=2)
+            self.dirty = False
+            self.saved_at = time.monotonic()
+        try:
+            with open(self.stats_file, 'w') as f:
+                f.write(data)
+        except Exception as e:
+            print(f"Error saving selector stats: {e}")
+
+    def order(self, chain, host, tiers):
+        """Strategies of a chain, tier by tier, best first within each tier for this host"""
+        with self.lock:
+            counts = self.stats.get(chain, {}).get(host, {})
         
-        max_retries = 30
+        def rank(item):
+            position, name = item
+            entry = counts.get(name, {})
+            hit_rate = (entry.get('hits', 0) + 1) / (entry.get('tries', 0) + 2)
+            return (-hit_rate, position)
         
-        for attempt in range(max_retries):
+        return [name for tier in tiers for _, name in sorted(enumerate(tier), key=rank)]
+
+    def record(self, chain, host, order, hit):
+        """Count an evaluation: every strategy before the hit missed"""
+        with self.lock:
+            counts = self.stats.setdefault(chain, {}).setdefault(host, {})
+            for name in order:
+                entry = counts.setdefault(name, {'hits': 0, 'tries': 0})
+                entry['tries'] += 1
+                if name == hit:
+                    entry['hits'] += 1
+                    break
+            self.dirty = True
+            due = time.monotonic() - self.saved_at >= self.save_interval
+        if due:
+            self.save()
+
+selector_stats = StrategyStats(SELECTOR_STATS_FILE)
+
+class CountdownTimings:
+    """
+    Per-host waits after the page load at which a file host accepted or
+    rejected its download form, as fractions of the countdown the page
+    showed, so pages with different countdowns share what was learned.
+    The form is first posted between the longest rejected and the shortest
+    accepted wait, so the two converge on the share of the countdown the
+    host really enforces; the countdown is the upper bound and is always
+    tried next if the probe is turned away.
+    Rejections fade with a half-life, so a host that shortened its wait is
+    probed again.
+    """
+    def __init__(self, stats_file, resolution=1.0, rejection_half_life=24 * 3600):
+        self.stats_file = stats_file
+        self.resolution = resolution
+        self.rejection_half_life = rejection_half_life
+        self.stats: Dict[str, Dict] = {}
+        self.lock = threading.Lock()
+
+    def load(self):
+        try:
+            if os.path.exists(self.stats_file):
+                with open(self.stats_file, 'r') as f:
+                    self.stats = json.load(f)
+        except Exception as e:
+            print(f"Error loading countdown stats: {e}")
+            self.stats = {}
+
+    def save(self):
+        try:
+            with open(self.stats_file, 'w') as f:
+                json.dump(self.stats, f, indent=2)
+        except Exception as e:
+            print(f"Error saving countdown stats: {e}")
+
+    def _rejected(self, entry):
+        """Longest rejected wait (fraction of the countdown), decayed by its age"""
+        if 'max_rejected_fraction' not in entry:
+            return 0
+        age = time.time() - entry.get('rejected_at', 0)
+        return entry['max_rejected_fraction'] * 0.5 ** (age / self.rejection_half_life)
+
+    def probe_wait(self, host, limit):
+        """
+        Seconds to wait before the first post.
+        
+        Args:
+            host (str): File host
+            limit (float): Wait known to work: the page's countdown, or the
+                resolver default when the page shows none
+            
+        Returns:
+            float: Midway between the longest rejected and the shortest
+            accepted wait (capped at limit) while they are further apart
+            than the resolution, else the shortest accepted wait
+        """
+        if not limit:
+            return 0
+        with self.lock:
+            entry = dict(self.stats.get(host, {}))
+        upper = min(entry.get('min_accepted_fraction', 1.0), 1.0)
+        lower = min(self._rejected(entry), upper)
+        if (upper - lower) * limit > self.resolution:
+            return limit * (lower + upper) / 2
+        return limit * upper
+
+    def record(self, host, elapsed, limit, accepted):
+        """
+        Record a form post made elapsed seconds after loading a page whose
+        countdown was limit seconds.
+        Only pass acceptances the host confirmed (a redirect or a video) and
+        rejections caused by posting too early; the newest observation wins
+        over an older one that contradicts it.
+        """
+        if not limit:
+            return
+        fraction = round(elapsed / limit, 3)
+        with self.lock:
+            entry = self.stats.setdefault(host, {})
+            if accepted:
+                entry['min_accepted_fraction'] = min(entry.get('min_accepted_fraction', fraction), fraction)
+                entry['accepted'] = entry.get('accepted', 0) + 1
+                if self._rejected(entry) >= fraction:
+                    entry.pop('max_rejected_fraction', None)
+            else:
+                entry['max_rejected_fraction'] = max(self._rejected(entry), fraction)
+                entry['rejected_at'] = time.time()
+                entry['rejected'] = entry.get('rejected', 0) + 1
+                if entry.get('min_accepted_fraction', float('inf')) <= fraction:
+                    entry.pop('min_accepted_fraction')
+            self.save()
+
+countdown_timings = CountdownTimings(COUNTDOWN_STATS_FILE)
+
+# ============================================================================
+# Page Parse Pool
+# ============================================================================
+# Parsing is CPU-bound; it runs in worker processes so it never holds the
+# GIL the event loop needs. Bytes go in, plain dicts/strings come out.
+page_parser = DramaPageParser()
+
+def parse_search_page(content, order=None):
+    """Search results page -> ([{'number', 'title', 'url'}, ...], selector that matched)"""
+    return page_parser.extract_search_results(parse_html(content, scope=SEARCH_SCOPE), order)
+
+def parse_drama_page(content):
+    """Drama page -> {season: [episode, ...]}, with the movie fallback"""
+    soup = parse_html(content, scope=EPISODE_PAGE_SCOPE)
+    seasons = page_parser.parse_elementor_episodes_by_season(soup)
+    
+    # Fallback to movie if no episodes found
+    if not seasons or all(len(eps) == 0 for eps in seasons.values()):
+        movie = page_parser.extract_movie_download(soup)
+        if movie:
+            return {"Movie": [movie]}
+    return seasons
+
+def parse_form_page(content, countdown_order=None):
+    """File host page -> download form fields and countdown, or None"""
+    return page_parser.extract_download_form(parse_html(content, scope=FORM_PAGE_SCOPE), countdown_order)
+
+def parse_link_page(content, order=None):
+    """Download form response -> (video link or None, strategy that found it)"""
+    return page_parser.extract_download_link(parse_html(content, scope=DOWNLOAD_LINK_SCOPE), order)
+
+parse_executor = None
+parse_pool_broken = False
+parse_pool_lock = threading.Lock()
+
+def get_parse_executor():
+    """
+    The parse pool, started on first use. Workers come from a forkserver
+    (spawn where that is missing): forking this process would copy the
+    locks of the thread pools running in it.
+    """
+    global parse_executor
+    with parse_pool_lock:
+        if parse_executor is None and PARSE_WORKERS and not parse_pool_broken:
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            parse_executor = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context(method))
+        return parse_executor
+
+def run_parser(parse, content, *args):
+    """
+    Run a page parser in the parse pool and wait for its result.
+    Called from worker threads; runs inline when the pool is disabled or broken.
+    """
+    global parse_executor, parse_pool_broken
+    executor = get_parse_executor()
+    if executor is not None:
+        try:
+            return executor.submit(parse, content, *args).result()
+        except BrokenProcessPool:
+            print("Parse pool crashed - parsing inline from now on")
+            with parse_pool_lock:
+                parse_pool_broken = True
+                parse_executor = None
+    return parse(content, *args)
+
+# ============================================================================
+# Drama Scraper Class
+# ============================================================================
+class DramaEpisodeScraper(DramaPageParser):
+    """
+    Scrapes drama episodes from thenkiri.com website.
+    Handles search, episode extraction, and video file downloads.
+    """
+    DOWNLOAD_HEADERS = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+        'Accept': '*/*',
+        'Connection': 'keep-alive',
+    }
+    OPENED_TTL = 60  # seconds an unclaimed probe response stays open
+    
+    def __init__(self):
+        self.session = self.new_session()
+        self.base_url = "https://thenkiri.com"
+        self.opened: Dict[str, tuple] = {}
+        self.opened_lock = threading.Lock()
+        os.makedirs(DOWNLOAD_PATH, exist_ok=True)
+        os.makedirs(THUMBNAIL_PATH, exist_ok=True)
+        
+    def search_drama(self, search_term):
+        """
+        Search for drama on the website.
+        
+        Args:
+            search_term (str): Drama name to search for
+            
+        Returns:
+            list: List of search results with title and URL
+        """
+        try:
+            search_url = f"{self.base_url}/?s={search_term}"
+            response = self.session.get(search_url, verify=False)
+            
+            if response.status_code == 200:
+                host = urlparse(search_url).netloc
+                order = selector_stats.order('search', host, self.SEARCH_TIERS)
+                results, hit = run_parser(parse_search_page, response.content, order)
+                selector_stats.record('search', host, order, hit)
+                return results
+            return []
+        except Exception as e:
+            print(f"Error searching: {e}")
+            return []
+    
+    def scrape_episodes(self, drama_url):
+        """
+        Scrape episodes from the selected drama page.
+        
+        Args:
+            drama_url (str): URL of the drama page
+            
+        Returns:
+            dict: Dictionary organized by season containing episode lists
+        """
+        try:
+            response = self.session.get(drama_url, verify=False)
+            response.raise_for_status()
+            
+            return run_parser(parse_drama_page, response.content)
+        except Exception as e:
+            print(f"Error scraping episodes: {e}")
+            return {}
+
+    def new_session(self):
+        """HTTP session with the scraper's browser headers and its own cookie jar"""
+        session = requests.Session()
+        session.headers.update({
+            'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:145.0) Gecko/20100101 Firefox/145.0',
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+            'Accept-Language': 'en-US,en;q=0.5',
+        })
+        session.verify = False
+        return session
+    
+    def is_direct_video_file(self, url, session=None):
+        """
+        Check if URL points to an actual video file by checking Content-Type.
+        
+        Args:
+            url (str): URL to check
+            session (requests.Session): Session to use (default: the scraper's)
+            
+        Returns:
+            bool: True if URL is a direct video file
+        """
+        try:
+            print(f"Checking if direct video: {url}")
+            
+            video_extensions = ['.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.webm', '.m4v']
+            url_lower = url.lower()
+            
+            has_video_extension = any(ext in url_lower for ext in video_extensions)
+            
+            if not has_video_extension:
+                print(f"No video extension in URL")
+                return False
+            
+            # Check Content-Type header
+            head_response = (session or self.session).head(url, verify=False, timeout=10, allow_redirects=True)
+            content_type = head_response.headers.get('Content-Type', '').lower()
+            content_length = head_response.headers.get('Content-Length', '0')
+            
+            print(f"Content-Type: {content_type}")
+            print(f"Content-Length: {content_length}")
+            
+            is_video = any(vid_type in content_type for vid_type in ['video/', 'application/octet-stream'])
+            is_large = int(content_length) > 1000000  # > 1MB
+            
+            if is_video and is_large:
+                print(f"✅ Confirmed direct video file")
+                return True
+            else:
+                print(f"❌ Not a video file (probably HTML page)")
+                return False
+                
+        except Exception as e:
+            print(f"Error checking video file: {e}")
+            return False
+    
+    def open_probe(self, url, session=None, headers=None):
+        """
+        Start a streamed GET and classify it from the response headers,
+        without reading the body. Replaces a separate HEAD round-trip.
+        
+        Args:
+            url (str): URL to probe
+            session (requests.Session): Session to use (default: the scraper's)
+            headers (dict): Request headers (default: DOWNLOAD_HEADERS); pass
+                the resolver's when the response may be reused as its page
+            
+        Returns:
+            tuple: (response, kind) with kind 'video', 'page' (HTML) or
+            'unknown' (headers inconclusive)
+        """
+        response = (session or self.session).get(url, headers=headers or self.DOWNLOAD_HEADERS, stream=True, verify=False, timeout=60)
+        content_type = response.headers.get('Content-Type', '').lower()
+        content_length = int(response.headers.get('Content-Length', 0) or 0)
+        print(f"Probe GET {response.status_code}: {content_type or 'no Content-Type'}, {content_length} bytes")
+        
+        if response.ok and any(vid_type in content_type for vid_type in ['video/', 'application/octet-stream']) and content_length > 1000000:
+            return response, 'video'
+        if 'text/html' in content_type:
+            return response, 'page'
+        return response, 'unknown'
+    
+    def keep_open(self, url, response):
+        """Hold a probe response for the download of url to continue"""
+        now = time.monotonic()
+        with self.opened_lock:
+            # Close probes nobody claimed (e.g. mirrors that lost the race)
+            for stale_url, (stale_response, opened_at) in list(self.opened.items()):
+                if now - opened_at > self.OPENED_TTL:
+                    stale_response.close()
+                    del self.opened[stale_url]
+            previous = self.opened.pop(url, None)
+            if previous:
+                previous[0].close()
+            self.opened[url] = (response, now)
+    
+    def take_opened(self, url):
+        """Claim a held probe response for url, if there is one"""
+        with self.opened_lock:
+            entry = self.opened.pop(url, None)
+        if entry and time.monotonic() - entry[1] > self.OPENED_TTL:
+            # Held past OPENED_TTL (e.g. by a speculative resolution) - the
+            # host may have dropped the idle connection
+            entry[0].close()
+            return None
+        return entry[0] if entry else None
+    
+    def discard_opened(self, urls):
+        """Close held probe responses that will not be used"""
+        for url in urls:
+            response = self.take_opened(url)
+            if response:
+                response.close()
+    
+    def release_mirrors(self, mirrors):
+        """Close what a resolution left open: held probes and its own sessions"""
+        self.discard_opened(url for url, _, _ in mirrors)
+        for session in {id(session): session for _, _, session in mirrors}.values():
+            if session is not self.session:
+                session.close()
+    
+    def download_direct_video(self, url, progress_callback=None, mirrors=None, session=None, size=None):
+        """
+        Download video file directly from URL with retry mechanism.
+        Stalled or dropped transfers resume from the current offset on a
+        fresh connection, rotating through mirrors when there are any.
+        
+        Args:
+            url (str): Direct video file URL
+            progress_callback (callable): Function to call with progress updates
+            mirrors (list): (url, session) pairs of other URLs serving the same file
+            session (requests.Session): Session the link was resolved on
+                (default: the scraper's), so host cookies go with the GET
+            size (int): File size if already known (e.g. from a mirror probe)
+            
+        Returns:
+            dict: Download result with success status, filepath, and file info
+        """
+        max_retries = 3
+        session = session or self.session
+        
+        for attempt in range(max_retries):
+            try:
+                if progress_callback:
+                    if attempt > 0:
+                        progress_callback(f"📥 Retry attempt {attempt + 1}...")
+                    else:
+                        progress_callback("📥 Direct video download...")
+                
+                # Extract filename from URL
+                filename = url.split('/')[-1].split('?')[0]
+                if not filename or '.' not in filename:
+                    filename = f"video_{int(time.time())}.mkv"
+                
+                filename = re.sub(r'[^\w\-_\.]', '_', filename)
+                
+                # Claim the name now; duplicates get a numbered suffix
+                filepath = claim_file_path(DOWNLOAD_PATH, filename)
+                filename = os.path.basename(filepath)
+                
+                if progress_callback:
+                    progress_callback(f"📥 Downloading: {filename}")
+                
+                print(f"Downloading direct video (attempt {attempt + 1}): {url}")
+                
+                headers = self.DOWNLOAD_HEADERS
+                
+                # The GET that identified this link as a video is still open
+                held = [self.take_opened(url)] if attempt == 0 else [None]
+                
+                # Wait until the file fits on disk before opening the
+                # transfer; a held probe is let go if the job has to queue
+                expected = size or (int(held[0].headers.get('Content-Length', 0) or 0) if held[0] else 0)
+                if not expected:
+                    expected = self.content_length(url, session)
+                
+                def let_go():
+                    if held[0]:
+                        held[0].close()
+                        held[0] = None
+                
+                reserved = expected or DISK_UNKNOWN_SIZE
+                disk_admission.reserve(filepath, reserved, progress_callback, on_wait=let_go)
+                
+                response = held[0] or session.get(url, headers=headers, stream=True, verify=False, timeout=60)
+                response.raise_for_status()
+                
+                total_size = int(response.headers.get('Content-Length', 0))
+                report_bytes = getattr(progress_callback, 'report_bytes', None)
+                
+                content_type = response.headers.get('Content-Type', '').lower()
+                if 'text/html' in content_type:
+                    raise ValueError(f"server sent an HTML page instead of the video ({content_type})")
+                
+                if total_size > reserved:
+                    disk_admission.reserve(filepath, total_size - reserved, progress_callback, held=[filepath])
+                
+                # Let a streaming upload follow this file as it is written
+                on_file_start = getattr(progress_callback, 'on_file_start', None)
+                if on_file_start:
+                    on_file_start(filepath, total_size)
+                
+                # Hash while downloading so the store can deduplicate
+                hasher = hashlib.sha256() if download_store.enabled or DOWNLOAD_HASH else None
+                
+                # Download with progress tracking
+                last_progress = 0
+                
+                def on_progress(downloaded):
+                    nonlocal last_progress
+                    if report_bytes:
+                        report_bytes(downloaded, total_size)
+                    elif total_size > 0 and progress_callback:
+                        progress = (downloaded / total_size) * 100
+                        if int(progress) // 10 > last_progress // 10:
+                            progress_callback(f"📥 Progress: {progress:.1f}%")
+                            last_progress = progress
+                
+                sources = [(url, session)] + [(mirror, mirror_session or self.session) for mirror, mirror_session in (mirrors or []) if mirror != url]
+                resumes = 0
+                
+                fd = os.open(filepath, os.O_WRONLY | os.O_TRUNC)
+                try:
+                    preallocate_file(fd, total_size)
+                    downloaded = 0
+                    while True:
+                        watch = download_watchdog.watch(response, downloaded)
+                        error = None
+                        try:
+                            downloaded = self._write_response(
+                                response, fd, downloaded, hasher,
+                                lambda position: (watch.update(position), on_progress(position))
+                            )
+                        except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError, ConnectionError, socket.timeout) as e:
+                            error = e
+                            downloaded = watch.position
+                        finally:
+                            download_watchdog.unwatch(watch)
+                            response.close()
+                        
+                        if not watch.stalled and error is None:
+                            break
+                        if not total_size or resumes >= DOWNLOAD_MAX_RESUMES:
+                            raise error or IOError("download stalled")
+                        
+                        # Pick up where the transfer stopped, on another mirror if known
+                        resumes += 1
+                        source, source_session = sources[resumes % len(sources)]
+                        reason = "stalled" if watch.stalled else "connection lost"
+                        print(f"🔁 Download {reason} at {format_bytes(downloaded)} - resuming ({resumes}/{DOWNLOAD_MAX_RESUMES}) from {source}")
+                        if progress_callback:
+                            progress_callback(f"🔁 Download {reason}, resuming...")
+                        
+                        response, downloaded = self._open_range(source, headers, downloaded, total_size, source_session)
+                        if downloaded == 0 and hasher:
+                            hasher = hashlib.sha256()
+                    
+                    if total_size and downloaded != total_size:
+                        raise IOError(f"download truncated: got {downloaded} of {total_size} bytes")
+                    if downloaded != total_size:
+                        os.ftruncate(fd, downloaded)
+                    if DOWNLOAD_FSYNC != "none":
+                        os.fsync(fd)
+                finally:
+                    os.close(fd)
+                
+                file_size = os.path.getsize(filepath) / (1024 * 1024)  # MB
+                
+                print(f"✅ Direct download successful: {filename} ({file_size:.2f} MB)")
+                if hasher:
+                    print(f"SHA-256: {hasher.hexdigest()}")
+                
+                return {
+                    'success': True,
+                    'filepath': filepath,
+                    'filename': filename,
+                    'size_mb': file_size,
+                    'sha256': hasher.hexdigest() if hasher else None
+                }
+                
+            except Exception as e:
+                print(f"Download attempt {attempt + 1} failed: {e}")
+                
+                # Clean up partial download
+                if 'filepath' in locals():
+                    disk_admission.release(filepath)
+                    if os.path.exists(filepath):
+                        try:
+                            os.remove(filepath)
+                        except:
+                            pass
+                
+                if attempt < max_retries - 1:
+                    time.sleep(3 * (attempt + 1))  # Exponential backoff
+                    continue
+                
+                return {
+                    'success': False,
+                    'error': str(e),
+                    'attempts': max_retries
+                }
+        
+        return None
+    
+    def content_length(self, url, session=None):
+        """File size from a HEAD request, 0 if unknown"""
+        try:
+            head = (session or self.session).head(url, headers=self.DOWNLOAD_HEADERS, verify=False, timeout=15, allow_redirects=True)
+            return int(head.headers.get('Content-Length', 0) or 0) if head.ok else 0
+        except (requests.exceptions.RequestException, ValueError):
+            return 0
+    
+    def _open_range(self, url, headers, offset, total_size, session=None):
+        """
+        Request the rest of a file from offset on a new connection.
+        
+        Returns:
+            tuple: (response, offset the response body starts at) - 0 when
+            the server ignored the Range header and sent the whole file
+        """
+        range_headers = dict(headers, Range=f"bytes={offset}-")
+        response = (session or self.session).get(url, headers=range_headers, stream=True, verify=False, timeout=60)
+        response.raise_for_status()
+        
+        if response.status_code == 206:
+            content_range = response.headers.get('Content-Range', '')
+            match = re.match(r'bytes (\d+)-\d+/(\d+|\*)', content_range)
+            if match and int(match.group(1)) == offset and match.group(2) in (str(total_size), '*'):
+                return response, offset
+            response.close()
+            raise IOError(f"unexpected Content-Range on resume: {content_range}")
+        
+        if int(response.headers.get('Content-Length', 0)) != total_size:
+            response.close()
+            raise IOError("mirror serves a different file size")
+        print("Server ignored the Range request - restarting from the beginning")
+        return response, 0
+    
+    def _write_response(self, response, fd, offset, hasher=None, on_progress=None):
+        """
+        Write a streamed response body to a file descriptor.
+        Reads go straight into one reusable buffer; the chunk size adapts to
+        the connection speed between DOWNLOAD_MIN_CHUNK and DOWNLOAD_MAX_CHUNK,
+        capped so one read at DOWNLOAD_MIN_SPEED takes a quarter of the stall
+        window (progress is only seen between reads).
+        A body starting at offset 0 must begin like a video file; the first
+        DOWNLOAD_SNIFF_BYTES are checked before anything else is read.
+        
+        Args:
+            response: Streamed requests response
+            fd (int): File descriptor to write to
+            offset (int): File position of the first body byte
+            hasher: Optional hashlib object fed with the body
+            on_progress (callable): Called with the file position after each write
+            
+        Returns:
+            int: File position after the last byte written
+            
+        Raises:
+            ValueError: The body is not a video (e.g. an HTML error page)
+        """
+        raw = response.raw
+        raw.decode_content = True
+        max_chunk = DOWNLOAD_MAX_CHUNK
+        if DOWNLOAD_MIN_SPEED:
+            max_chunk = min(max_chunk, DOWNLOAD_MIN_SPEED * DOWNLOAD_STALL_WINDOW // 4)
+        min_chunk = min(DOWNLOAD_MIN_CHUNK, max_chunk)
+        buffer = bytearray(max_chunk)
+        view = memoryview(buffer)
+        position = offset
+        
+        if offset == 0:
+            read = raw.readinto(view[:DOWNLOAD_SNIFF_BYTES])
+            container = sniff_video_container(bytes(view[:read]))
+            if container == 'html':
+                raise ValueError("server sent an HTML page instead of the video")
+            if container is None:
+                print("⚠️ Unrecognized container format, continuing")
+            os.pwrite(fd, view[:read], 0)
+            if hasher:
+                hasher.update(view[:read])
+            position = read
+            if on_progress:
+                on_progress(position)
+        
+        chunk_size = min_chunk
+        unsynced = 0
+        
+        while True:
+            started = time.monotonic()
+            read = raw.readinto(view[:chunk_size])
+            if not read:
+                break
+            elapsed = time.monotonic() - started
+            
+            data = view[:read]
+            written = 0
+            while written < read:
+                written += os.pwrite(fd, data[written:], position + written)
+            if hasher:
+                hasher.update(data)
+            position += read
+            
+            if DOWNLOAD_FSYNC == "periodic":
+                unsynced += read
+                if unsynced >= DOWNLOAD_FSYNC_BYTES:
+                    os.fsync(fd)
+                    unsynced = 0
+            
+            if on_progress:
+                on_progress(position)
+            
+            # Size the next read so it takes about DOWNLOAD_READ_TARGET seconds
+            if read == chunk_size and elapsed > 0:
+                target = int(read / elapsed * DOWNLOAD_READ_TARGET)
+                chunk_size = max(min_chunk, min(max_chunk, target))
+        
+        return position
+    
+    def resolve_episode(self, page_url, progress_callback=None, candidates=None, session=None):
+        """
+        Resolve an episode's download links to direct video URLs.
+        With several candidate links, the mirrors are raced and ranked.
+        
+        Args:
+            page_url (str): Episode download link
+            progress_callback (callable): Function for progress updates
+            candidates (list): Other download links for the same episode
+            session (requests.Session): Session to resolve on (default: the scraper's)
+            
+        Returns:
+            list: (direct URL, size or None, session) triples, fastest
+            first; empty if nothing resolved. The session is the one the
+            link was resolved on and should be used to download it.
+        """
+        session = session or self.session
+        links = list(dict.fromkeys([page_url] + (candidates or [])))
+        if len(links) == 1:
+            download_url = self.resolve_download_url(page_url, progress_callback, session)
+            return [(download_url, None, session)] if download_url else []
+        
+        if progress_callback:
+            progress_callback(f"🏁 Racing {len(links)} mirrors...")
+        resolved = self.resolve_mirrors(links, session)
+        mirrors = self.rank_mirrors(resolved)
+        if not mirrors:
+            print("No mirror could be resolved")
+        return mirrors
+    
+    def extract_and_download(self, page_url, progress_callback=None, candidates=None, mirrors=None):
+        """
+        Smart download handler that detects if URL is direct video or file host page.
+        Extracts download link from file host if needed, then downloads the video.
+        Episodes already in the download store are returned without downloading.
+        With several candidate links, the fastest mirror is used and the
+        others serve as failover.
+        
+        Args:
+            page_url (str): URL to download from
+            progress_callback (callable): Function for progress updates
+            candidates (list): Other download links for the same episode
+            mirrors (list): Links already resolved by resolve_episode
+                (None = resolve now); closed when done
+            
+        Returns:
+            dict: Download result with success status and file info
+        """
+        stored = download_store.lookup(page_url)
+        if stored:
+            if mirrors:
+                self.release_mirrors(mirrors)
+            return stored
+        
+        if mirrors is None:
+            mirrors = self.resolve_episode(page_url, progress_callback, candidates)
+        if not mirrors:
+            return None
+        
+        # Fastest first; on failure fall over to the next one
+        result = None
+        try:
+            for index, (download_url, size, session) in enumerate(mirrors):
+                same_file = [(url, other_session) for url, other_size, other_session in mirrors[index + 1:] if size and other_size == size]
+                result = self.download_direct_video(download_url, progress_callback, mirrors=same_file, session=session, size=size)
+                if result and result.get('success'):
+                    return download_store.add(result, aliases=[page_url])
+                if index + 1 < len(mirrors):
+                    print(f"Mirror failed, trying the next one: {mirrors[index + 1][0]}")
+                    if progress_callback:
+                        progress_callback("🔀 Mirror failed - switching to the next one...")
+            return result
+        finally:
+            # Probe GETs held for mirrors that were never downloaded
+            self.release_mirrors(mirrors)
+    
+    def resolve_mirrors(self, links, session=None):
+        """
+        Resolve several download pages in parallel, each on a session of its
+        own so file hosts' cookies never mix. The first link uses the given
+        session, the others fresh ones.
+        Once the first one resolves, the rest get MIRROR_RACE_GRACE seconds;
+        then the ones still running are cancelled.
+        
+        Returns:
+            list: (direct video URL, session) pairs that resolved in time
+        """
+        session = session or self.session
+        pool = ThreadPoolExecutor(max_workers=len(links), thread_name_prefix="mirror")
+        cancel = threading.Event()
+        sessions = {}
+        for index, link in enumerate(links):
+            mirror_session = session if index == 0 else self.new_session()
+            sessions[pool.submit(self.resolve_download_url, link, None, mirror_session, cancel)] = mirror_session
+        
+        def close_unused(future):
+            # Probes and sessions of failed or dropped links; the given
+            # session is the caller's
+            url = None if future.cancelled() or future.exception() else future.result()
+            if url and url not in {resolved_url for resolved_url, _ in resolved}:
+                self.discard_opened([url])
+            mirror_session = sessions[future]
+            if mirror_session is not session:
+                mirror_session.close()
+        
+        resolved = []
+        deadline = None
+        try:
+            pending = set(sessions)
+            while pending:
+                timeout = None if deadline is None else max(0, deadline - time.monotonic())
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    break
+                for future in done:
+                    url = future.result()
+                    if url:
+                        resolved.append((url, sessions[future]))
+                    else:
+                        close_unused(future)
+                if resolved and deadline is None:
+                    deadline = time.monotonic() + MIRROR_RACE_GRACE
+        except Exception:
+            for mirror_session in sessions.values():
+                if mirror_session is not session:
+                    mirror_session.close()
+            raise
+        finally:
+            # Stragglers stop at their next check; their results are dropped
+            cancel.set()
+            for future in pending:
+                future.add_done_callback(close_unused)
+            pool.shutdown(wait=False, cancel_futures=True)
+        return resolved
+    
+    def probe_mirror(self, url, session=None):
+        """
+        Measure a direct link: HEAD latency plus a short ranged read.
+        
+        Returns:
+            dict: url, size and measured speed (bytes/s), or None if unhealthy
+        """
+        try:
+            started = time.monotonic()
+            session = session or self.session
+            head = session.head(url, verify=False, timeout=MIRROR_PROBE_TIMEOUT, allow_redirects=True)
+            head.raise_for_status()
+            latency = time.monotonic() - started
+            size = int(head.headers.get('Content-Length', 0))
+            if 'text/html' in head.headers.get('Content-Type', '').lower():
+                return None
+            
+            started = time.monotonic()
+            headers = {'Range': f"bytes=0-{MIRROR_PROBE_BYTES - 1}"}
+            with session.get(url, headers=headers, stream=True, verify=False, timeout=MIRROR_PROBE_TIMEOUT) as response:
+                response.raise_for_status()
+                data = response.raw.read(MIRROR_PROBE_BYTES)
+            elapsed = time.monotonic() - started
+            
+            if not data or sniff_video_container(data) == 'html':
+                return None
+            speed = len(data) / max(elapsed, 0.001)
+            print(f"Mirror probe: {format_bytes(speed)}/s, {latency * 1000:.0f} ms - {url}")
+            return {'url': url, 'size': size, 'speed': speed}
+        except Exception as e:
+            print(f"Mirror probe failed for {url}: {e}")
+            return None
+    
+    def rank_mirrors(self, resolved):
+        """
+        Probe direct links in parallel and order the healthy ones by speed.
+        Mirrors whose probe failed (no HEAD/Range support, a slow host) go
+        last, still available for failover.
+        
+        Args:
+            resolved (list): (url, session) pairs from resolve_mirrors
+        
+        Returns:
+            list: (url, size or None, session) tuples, fastest first
+        """
+        if not resolved:
+            return []
+        with ThreadPoolExecutor(max_workers=len(resolved), thread_name_prefix="probe") as pool:
+            probes = list(pool.map(lambda mirror: self.probe_mirror(*mirror), resolved))
+        ranked = sorted(((probe, session) for probe, (_, session) in zip(probes, resolved) if probe),
+                        key=lambda item: item[0]['speed'], reverse=True)
+        unprobed = [(url, None, session) for probe, (url, session) in zip(probes, resolved) if not probe]
+        return [(probe['url'], probe['size'], session) for probe, session in ranked] + unprobed
+    
+    def resolve_download_url(self, page_url, progress_callback=None, session=None, cancel=None):
+        """
+        Resolve a page URL to a direct video URL.
+        Direct video URLs are returned as-is; file host pages go through the
+        resolver registered for their host.
+        
+        Args:
+            page_url (str): URL to resolve
+            progress_callback (callable): Function for progress updates
+            session (requests.Session): Session to use (default: the scraper's)
+            cancel (threading.Event): Set to abandon a file host resolution
+            
+        Returns:
+            str: Direct video URL, or None if resolution failed
+        """
+        
+        print(f"\n{'='*60}")
+        print(f"Processing URL: {page_url}")
+        print(f"{'='*60}")
+        
+        # Check if it's a direct video file: one GET decides, and its
+        # response becomes either the download or the page to resolve, so
+        # it is sent with the resolver's headers
+        resolver = resolver_for(page_url)
+        page = None
+        video_extensions = ['.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.webm', '.m4v']
+        if any(ext in page_url.lower() for ext in video_extensions):
             try:
-                # Extract file ID from URL
-                try:
-                    url_parts = page_url.split('/')
-                    file_id = url_parts[4] if len(url_parts) > 4 else url_parts[3]
-                except IndexError:
-                    print(f"Failed to extract file ID from URL: {page_url}")
-                    return None
-                
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                    'Accept-Language': 'en-US,en;q=0.5',
-                    'Accept-Encoding': 'gzip, deflate',
-                    'DNT': '1',
-                    'Connection': 'keep-alive',
-                    'Upgrade-Insecure-Requests': '1',
-                }
-                
-                # Get the initial page
+                response, kind = self.open_probe(page_url, session, resolver.headers)
+            except requests.exceptions.RequestException as e:
+                print(f"Probe GET failed: {e}")
+                response, kind = None, 'unknown'
+            
+            if kind == 'video':
+                print("✅ Direct video file detected - downloading...")
+                self.keep_open(page_url, response)
+                return page_url
+            if kind == 'page' and response.status_code == 200:
+                page = response
+            else:
+                if response is not None:
+                    response.close()
+                # Headers were inconclusive - fall back to HEAD
+                if kind == 'unknown' and self.is_direct_video_file(page_url, session):
+                    print("✅ Direct video file detected - downloading...")
+                    return page_url
+        
+        print(f"📄 File host page detected - resolving with {type(resolver).__name__}...")
+        return resolver.resolve(self, page_url, progress_callback, page=page, session=session, cancel=cancel)
+
+# ============================================================================
+# File Host Resolvers
+# ============================================================================
+class FileHostResolver:
+    """
+    Generic resolver for file host pages, used for unknown hosts.
+    Finds the download form heuristically, waits out the countdown (or the
+    shorter wait the host is known to accept), submits the form and looks
+    for the video link in the redirect or the page, then confirms the link
+    is a video.
+    
+    Subclasses for known hosts declare how the host behaves, so the steps
+    that only guess can be skipped:
+        hosts: Hostnames handled (subdomains included)
+        countdown_strategies: Countdown strategies to use (None = ranked
+            from selector stats)
+        default_wait: Seconds to wait when no countdown is found and no
+            accepted wait is known
+        link_ttl: Seconds a resolved link stays usable (None = unknown)
+        verify_link: Confirm a redirect's link is a video before returning
+            it (links found in a returned page are always confirmed)
+        max_attempts: Attempts before giving up
+    """
+    hosts = ()
+    countdown_strategies = None
+    default_wait = 10
+    link_ttl = None
+    verify_link = True
+    max_attempts = 30
+    
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.5',
+        'Accept-Encoding': 'gzip, deflate',
+        'DNT': '1',
+        'Connection': 'keep-alive',
+        'Upgrade-Insecure-Requests': '1',
+    }
+    
+    def file_id(self, page_url):
+        """File ID from the page URL; a hidden 'id' field on the form overrides it"""
+        url_parts = page_url.split('/')
+        return url_parts[4] if len(url_parts) > 4 else url_parts[3]
+    
+    def form_data(self, page_url, fields):
+        """POST body for the download form"""
+        form_data = {
+            'op': 'download2',
+            'id': self.file_id(page_url),
+            'rand': '',
+            'referer': '',
+            'method_free': 'Free Download',
+            'method_premium': ''
+        }
+        form_data.update(fields)
+        return form_data
+    
+    def retry_delay(self, attempt):
+        return 2 ** attempt
+    
+    def submit_form(self, session, page_url, fields):
+        """
+        Post the download form and look for the video link in the redirect
+        or the returned page.
+        
+        Returns:
+            tuple: (download URL or None, response status code)
+        """
+        host = urlparse(page_url).netloc
+        post_headers = {
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'Origin': f"{urlparse(page_url).scheme}://{host}",
+            'Referer': page_url,
+            'User-Agent': self.headers['User-Agent'],
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+            'Cache-Control': 'no-cache',
+        }
+        
+        post_response = session.post(
+            page_url,
+            data=self.form_data(page_url, fields),
+            headers=post_headers,
+            allow_redirects=False,
+            timeout=30,
+            verify=False
+        )
+        
+        download_url = None
+        
+        # Check for redirect
+        if post_response.status_code == 302:
+            download_url = post_response.headers.get('Location')
+            print(f"Redirect found: {download_url}")
+        
+        # Parse response for download link
+        elif post_response.status_code == 200:
+            link_order = selector_stats.order('download_link', host, DramaPageParser.DOWNLOAD_LINK_TIERS)
+            download_url, hit = run_parser(parse_link_page, post_response.content, link_order)
+            selector_stats.record('download_link', host, link_order, hit)
+        
+        return download_url, post_response.status_code
+    
+    def verify_video_link(self, scraper, url, session=None):
+        """Check a resolved link with a streamed GET, falling back to HEAD"""
+        try:
+            response, kind = scraper.open_probe(url, session)
+        except requests.exceptions.RequestException as e:
+            print(f"Probe GET failed: {e}")
+            return scraper.is_direct_video_file(url, session)
+        
+        if kind == 'video':
+            scraper.keep_open(url, response)
+            return True
+        response.close()
+        return kind == 'unknown' and scraper.is_direct_video_file(url, session)
+    
+    def resolve(self, scraper, page_url, progress_callback=None, page=None, session=None, cancel=None):
+        """
+        Resolve a file host page to a direct video URL.
+        
+        Args:
+            scraper (DramaEpisodeScraper): Scraper whose session is used
+            page_url (str): File host page
+            progress_callback (callable): Function for progress updates
+            page: Already fetched response for page_url (first attempt only)
+            session (requests.Session): Session (and cookie jar) to use;
+                defaults to the scraper's
+            cancel (threading.Event): Set to abandon the resolution; checked
+                between attempts and cuts the waits short
+            
+        Returns:
+            str: Direct video URL, or None if resolution failed
+        """
+        session = session or scraper.session
+        host = urlparse(page_url).netloc
+        sleep = cancel.wait if cancel else time.sleep
+        
+        # A URL without a file ID stays without one; retrying cannot help
+        try:
+            self.file_id(page_url)
+        except IndexError:
+            print(f"Failed to extract file ID from URL: {page_url}")
+            return None
+        
+        for attempt in range(self.max_attempts):
+            if cancel and cancel.is_set():
+                print(f"Resolution cancelled: {page_url}")
+                return None
+            retry = attempt < self.max_attempts - 1
+            try:
+                # Get the initial page (unless the direct-video probe already did)
                 try:
-                    response = self.session.get(page_url, headers=headers, timeout=30, verify=False)
+                    response, page = page, None
+                    if response is None:
+                        response = session.get(page_url, headers=self.headers, timeout=30, verify=False)
+                    loaded_at = time.monotonic()
                     if response.status_code != 200:
                         print(f"Initial page request failed: {response.status_code}")
-                        if attempt < max_retries - 1:
-                            time.sleep(2 ** attempt)
+                        if retry:
+                            sleep(self.retry_delay(attempt))
                             continue
                         return None
                 except requests.exceptions.RequestException as e:
                     print(f"Network error on attempt {attempt + 1}: {e}")
-                    if attempt < max_retries - 1:
-                        time.sleep(2 ** attempt)
+                    if retry:
+                        sleep(self.retry_delay(attempt))
                         continue
                     return None
                 
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                # Find the download form
-                form = (soup.find('form', {'name': 'F1'}) or 
-                       soup.find('form', {'id': 'downloadform'}) or 
-                       soup.find('form', action=re.compile(r'downloadwella|dl')) or
-                       soup.find('form'))
+                countdown_order = self.countdown_strategies or selector_stats.order('countdown', host, DramaPageParser.COUNTDOWN_TIERS)
+                page_form = run_parser(parse_form_page, response.content, countdown_order)
                 
-                if not form:
+                if not page_form:
                     print("Download form not found")
-                    if attempt < max_retries - 1:
-                        time.sleep(2)
+                    if retry:
+                        sleep(2)
                         continue
                     return None
                 
-                # Build form data
-                form_data = {
-                    'op': 'download2',
-                    'id': file_id,
-                    'rand': '',
-                    'referer': '',
-                    'method_free': 'Free Download',
-                    'method_premium': ''
-                }
-                
-                # Extract hidden form fields
-                for input_field in form.find_all('input'):
-                    input_type = input_field.get('type', '').lower()
-                    name = input_field.get('name')
-                    value = input_field.get('value', '')
-                    
-                    if name and input_type in ['hidden', 'submit']:
-                        form_data[name] = value
-                
-                # Find countdown timer
-                countdown_selectors = ['span.seconds', '#countdown', '.countdown', 'span[id*="count"]', 'div[id*="wait"]', '.timer']
-                
-                wait_time = 0
-                for selector in countdown_selectors:
-                    countdown = soup.select_one(selector)
-                    if countdown:
-                        try:
-                            countdown_text = countdown.get_text()
-                            numbers = re.findall(r'\d+', countdown_text)
-                            if numbers:
-                                wait_time = int(numbers[0])
-                                break
-                        except (AttributeError, ValueError):
-                            continue
-                
-                # Fallback: check JavaScript for timer
-                if wait_time == 0:
-                    scripts = soup.find_all('script')
-                    for script in scripts:
-                        script_text = script.get_text()
-                        if 'countdown' in script_text.lower() or 'timer' in script_text.lower():
-                            numbers = re.findall(r'\b(\d+)\b', script_text)
-                            for num in numbers:
-                                if 5 <= int(num) <= 60:
-                                    wait_time = int(num)
-                                    break
-                            if wait_time > 0:
-                                break
-                
-                # Default wait time if none found
-                if wait_time == 0:
-                    wait_time = 10
+                if not self.countdown_strategies:
+                    selector_stats.record('countdown', host, countdown_order, page_form['strategy'])
+                limit = page_form['wait_time'] or self.default_wait
+                wait_time = countdown_timings.probe_wait(host, limit)
                 
                 if progress_callback:
-                    progress_callback(f"⏳ Waiting {wait_time} seconds (required by site)...")
-                
-                print(f"Waiting {wait_time} seconds...")
-                time.sleep(wait_time + 2)
-                
-                # Submit the form
-                post_headers = {
-                    'Content-Type': 'application/x-www-form-urlencoded',
-                    'Origin': 'https://downloadwella.com',
-                    'Referer': page_url,
-                    'User-Agent': headers['User-Agent'],
-                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                    'Cache-Control': 'no-cache',
-                }
-                
-                try:
-                    post_response = self.session.post(
-                        page_url,
-                        data=form_data,
-                        headers=post_headers,
-                        allow_redirects=False,
-                        timeout=30,
-                        verify=False
-                    )
-                except requests.exceptions.RequestException as e:
-                    print(f"Form submission error: {e}")
-                    if attempt < max_retries - 1:
-                        time.sleep(2 ** attempt)
-                        continue
-                    return None
+                    progress_callback(f"⏳ Waiting {math.ceil(wait_time)} seconds (required by site)...")
                 
-                download_url = None
-                
-                # Check for redirect
-                if post_response.status_code == 302:
-                    download_url = post_response.headers.get('Location')
-                    print(f"Redirect found: {download_url}")
-                
-                # Parse response for download link
-                elif post_response.status_code == 200:
-                    response_soup = BeautifulSoup(post_response.content, 'html.parser')
-                    
-                    # Try multiple patterns to find download link
-                    download_patterns = [
-                        response_soup.find('a', {'id': re.compile(r'download', re.I)}),
-                        response_soup.find('a', {'class': re.compile(r'download', re.I)}),
-                        response_soup.find('a', string=re.compile(r'download', re.I)),
-                        response_soup.find('a', href=re.compile(r'\.(mp4|mkv|avi|mov|wmv|flv|webm)', re.I)),
-                        response_soup.find('a', href=re.compile(r'nkiserv\.com|cdn\.|storage\.|files/', re.I)),
-                        response_soup.find('a', href=re.compile(r'/d/|/download/|/file/', re.I)),
-                        response_soup.find('button', {'onclick': re.compile(r'download|location', re.I)}),
-                    ]
+                # Post at the probe time; if that is early and gets rejected,
+                # post again once the full countdown has passed
+                download_url, status, early, verified = None, None, None, None
+                for post_at in sorted({wait_time, limit}):
+                    delay = loaded_at + post_at + COUNTDOWN_GRACE - time.monotonic()
+                    if delay > 0:
+                        print(f"Waiting {delay:.1f} seconds...")
+                        sleep(delay)
+                    if cancel and cancel.is_set():
+                        print(f"Resolution cancelled: {page_url}")
+                        return None
                     
-                    for pattern in download_patterns:
-                        if pattern:
-                            if pattern.name == 'button' and pattern.get('onclick'):
-                                onclick = pattern.get('onclick')
-                                url_match = re.search(r"['\"](https?://[^'\"]+)['\"]", onclick)
-                                if url_match:
-                                    download_url = url_match.group(1)
-                                    break
-                            elif pattern.get('href'):
-                                download_url = pattern.get('href')
-                                break
+                    elapsed = time.monotonic() - loaded_at
+                    try:
+                        download_url, status = self.submit_form(session, page_url, page_form['fields'])
+                    except requests.exceptions.RequestException as e:
+                        print(f"Form submission error: {e}")
+                        break
+                    if status not in (200, 302):
+                        break
                     
-                    # Fallback: search JavaScript code
-                    if not download_url:
-                        scripts = response_soup.find_all('script')
-                        for script in scripts:
-                            script_text = script.get_text()
-                            
-                            # Look for video file URLs
-                            js_urls = re.findall(r'["\']https?://[^"\']*\.(mp4|mkv|avi|mov|wmv)[^"\']*["\']', script_text, re.I)
-                            if js_urls:
-                                download_url = js_urls[0].strip('"\'')
-                                break
-                            
-                            # Look for CDN/server URLs
-                            server_urls = re.findall(r'["\']https?://[^"\']*(?:nkiserv|cdn|storage|files)[^"\']*["\']', script_text, re.I)
-                            if server_urls:
-                                download_url = server_urls[0].strip('"\'')
-                                break
-                            
-                            # Look for redirect URLs
-                            redirect_urls = re.findall(r'location\.(?:href|replace)\s*[=\(]\s*["\']([^"\']+)["\']', script_text)
-                            if redirect_urls:
-                                download_url = redirect_urls[0]
-                                break
+                    if download_url:
+                        download_url = urljoin(page_url, download_url)
+                        # A link scraped from a returned page may be the
+                        # wait page's own button; only a redirect or a video
+                        # proves the host took the post (the verifying GET
+                        # is kept open for the download)
+                        verified = None if status == 302 else self.verify_video_link(scraper, download_url, session)
+                        if status == 302 or verified:
+                            countdown_timings.record(host, elapsed, limit, True)
+                            # The same form went through later, so the early
+                            # post was turned away for its timing alone
+                            if early is not None:
+                                countdown_timings.record(host, early, limit, False)
+                            break
+                        if post_at == limit:
+                            break
+                        download_url = None
+                    if post_at < limit:
+                        early = elapsed
+                        print(f"Form rejected {elapsed:.1f}s after page load - posting again after the countdown")
                 
-                else:
-                    print(f"Unexpected response status: {post_response.status_code}")
-                    if attempt < max_retries - 1:
-                        time.sleep(2 ** attempt)
+                if status not in (200, 302):
+                    if status:
+                        print(f"Unexpected response status: {status}")
+                    if retry:
+                        sleep(self.retry_delay(attempt))
                         continue
                     return None
                 
                 if not download_url:
                     print("No download link found")
-                    if attempt < max_retries - 1:
-                        time.sleep(2 ** attempt)
+                    if retry:
+                        sleep(self.retry_delay(attempt))
                         continue
                     return None
                 
-                # Normalize URL
-                if not download_url.startswith('http'):
-                    if download_url.startswith('//'):
-                        download_url = 'https:' + download_url
-                    elif download_url.startswith('/'):
-                        download_url = 'https://downloadwella.com' + download_url
-                    else:
-                        download_url = 'https://downloadwella.com/' + download_url
-                
                 print(f"Extracted download URL: {download_url}")
                 
-                # Verify it's actually a video file
-                if not self.is_direct_video_file(download_url):
+                # Verify it's actually a video file (a link from a returned
+                # page was checked already); the verifying GET is kept open
+                # for the download
+                if verified is None and self.verify_link:
+                    verified = self.verify_video_link(scraper, download_url, session)
+                if verified is False:
                     print(f"❌ WARNING: Extracted URL is NOT a video file!")
-                    if attempt < max_retries - 1:
-                        time.sleep(2 ** attempt)
+                    if retry:
+                        sleep(self.retry_delay(attempt))
                         continue
                     return None
                 
-                return self.download_direct_video(download_url, progress_callback)
+                return download_url
                 
             except Exception as e:
                 print(f"Attempt {attempt + 1} failed: {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(2 ** attempt)
+                if retry:
+                    sleep(self.retry_delay(attempt))
+                    continue
+                return None
+        
+        print(f"All {self.max_attempts} attempts failed")
+        return None
+
+class DownloadwellaResolver(FileHostResolver):
+    """
+    downloadwella.com: XFileSharing form F1, countdown in span.seconds, and
+    the form POST answers with a 302 straight to the file. The download
+    itself checks the content, so a redirect's link is not verified.
+    """
+    hosts = ('downloadwella.com',)
+    countdown_strategies = ['span.seconds', 'script']
+    default_wait = 10
+    link_ttl = 3600  # links carry a session token; treat them as short-lived
+    verify_link = False
+    
+    def retry_delay(self, attempt):
+        return 3 * (attempt + 1)
+
+resolvers: Dict[str, FileHostResolver] = {}
+generic_resolver = FileHostResolver()
+
+def register_resolver(resolver):
+    """Make a resolver handle its declared hosts"""
+    for host in resolver.hosts:
+        resolvers[host] = resolver
+
+def resolver_for(url):
+    """Resolver for a URL's host or any parent domain, else the generic one"""
+    host = (urlparse(url).hostname or '').lower()
+    while host:
+        if host in resolvers:
+            return resolvers[host]
+        host = host.partition('.')[2]
+    return generic_resolver
+
+register_resolver(DownloadwellaResolver())
+
+# ============================================================================
+# Resolved Link Cache
+# ============================================================================
+resolve_executor = ThreadPoolExecutor(max_workers=RESOLVE_WORKERS, thread_name_prefix="resolve")
+
+class ResolvedLinks:
+    """
+    Episodes resolved ahead of their download, keyed by the episode's
+    download link. Entries expire with the link TTL of the file host
+    (RESOLVED_LINK_TTL when it declares none) and are purged whenever a new
+    one is added; failed resolutions are not kept. A resolution that is still running is handed over as it is, so
+    a click during a speculative resolution waits for it instead of
+    starting over.
+    """
+    def __init__(self, executor):
+        self.executor = executor
+        self.entries: Dict[str, Dict] = {}
+        self.lock = threading.Lock()
+
+    def ttl(self, links):
+        """Shortest link TTL among the hosts of an episode's links"""
+        ttls = [resolver_for(link).link_ttl for link in links]
+        return min([ttl for ttl in ttls if ttl] or [RESOLVED_LINK_TTL])
+
+    def _live(self, link):
+        entry = self.entries.get(link)
+        if entry and entry['expires'] and entry['expires'] < time.monotonic():
+            del self.entries[link]
+            scraper.release_mirrors(entry['future'].result())
+            return None
+        return entry
+
+    def _purge(self):
+        """Drop every expired entry, closing what its resolution left open"""
+        now = time.monotonic()
+        for link in [link for link, entry in self.entries.items() if entry['expires'] and entry['expires'] < now]:
+            self._live(link)
+
+    def contains(self, link):
+        """Whether link is resolving or resolved and unexpired"""
+        with self.lock:
+            return self._live(link) is not None
+
+    def _resolve(self, episode):
+        """Resolve an episode on a session of its own, kept for its download"""
+        session = scraper.new_session()
+        try:
+            mirrors = scraper.resolve_episode(episode['download_link'], None, episode.get('download_links'), session)
+        except Exception:
+            session.close()
+            raise
+        # The first link may have lost the race; its session is then unused
+        if not any(mirror_session is session for _, _, mirror_session in mirrors):
+            session.close()
+        return mirrors
+
+    def _submit(self, episode):
+        return self.executor.submit(self._resolve, episode)
+
+    def resolve(self, episode):
+        """
+        Start resolving an episode into the cache, unless it is cached or
+        resolving already.
+        
+        Returns:
+            Future: Resolves to the episode's mirrors
+        """
+        link = episode['download_link']
+        with self.lock:
+            entry = self._live(link)
+            if entry:
+                return entry['future']
+            # Entries nobody asks for again would otherwise hold their
+            # sessions and probes until exit
+            self._purge()
+            future = self._submit(episode)
+            self.entries[link] = {'future': future, 'expires': None}
+        links = [link] + (episode.get('download_links') or [])
+        future.add_done_callback(functools.partial(self._resolved, link, links))
+        return future
+
+    def _resolved(self, link, links, future):
+        with self.lock:
+            entry = self.entries.get(link)
+            if not entry or entry['future'] is not future:
+                return
+            if future.cancelled() or future.exception() or not future.result():
+                del self.entries[link]
+            else:
+                entry['expires'] = time.monotonic() + self.ttl(links)
+
+    def take(self, link):
+        """
+        Claim a cached or running resolution of link for a download.
+        
+        Returns:
+            Future: Resolves to the episode's mirrors, or None if there is none
+        """
+        with self.lock:
+            entry = self._live(link)
+            if entry:
+                del self.entries[link]
+        return entry['future'] if entry else None
+
+    def claim(self, episode):
+        """Take over the episode's resolution, or start one that bypasses the cache"""
+        return self.take(episode['download_link']) or self._submit(episode)
+
+resolved_links = ResolvedLinks(resolve_executor)
+speculative_links: Dict[int, set] = {}
+
+async def speculate(user_id, episodes):
+    """
+    Start resolving episodes the user is likely to pick next, while fewer
+    than SPECULATIVE_BUDGET of the user's speculative resolutions are
+    running or waiting unclaimed.
+    
+    Args:
+        user_id (int): Telegram user ID
+        episodes (list): Episode dicts, most likely first
+    """
+    # Stored episodes need no link; the check touches the disk, so it runs
+    # off the event loop (and before the budget is counted)
+    stored = await asyncio.to_thread(
+        lambda: {episode['download_link'] for episode in episodes if download_store.contains(episode['download_link'])}
+    )
+    
+    owned = {link for link in speculative_links.get(user_id, ()) if resolved_links.contains(link)}
+    for episode in episodes:
+        if len(owned) >= SPECULATIVE_BUDGET:
+            break
+        link = episode['download_link']
+        if link in stored or resolved_links.contains(link):
+            continue
+        print(f"Speculatively resolving: {episode['title']}")
+        resolved_links.resolve(episode)
+        owned.add(link)
+    speculative_links[user_id] = owned
+
+# ============================================================================
+# Download Watchdog
+# ============================================================================
+class DownloadWatch:
+    """Position and throughput samples of one transfer"""
+    def __init__(self, response, position):
+        self.response = response
+        self.position = position
+        self.started = time.monotonic()
+        self.samples = deque()
+        self.stalled = False
+
+    def update(self, position):
+        self.position = position
+
+class DownloadWatchdog:
+    """
+    Cuts off transfers whose rolling throughput stays below a floor.
+    A socket timeout never fires for a connection that trickles a few bytes
+    a minute, so one thread samples every transfer's position and shuts the
+    socket down when a full window stays below min_speed; the blocked read
+    then fails and the download resumes elsewhere.
+    """
+    def __init__(self, min_speed, window, interval=1):
+        self.min_speed = min_speed
+        self.window = window
+        self.interval = interval
+        self.watches = set()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def watch(self, response, position=0):
+        """Start watching a streamed response"""
+        watch = DownloadWatch(response, position)
+        with self.lock:
+            self.watches.add(watch)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="download-watchdog", daemon=True)
+                self.thread.start()
+        return watch
+
+    def unwatch(self, watch):
+        with self.lock:
+            self.watches.discard(watch)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            now = time.monotonic()
+            with self.lock:
+                watches = list(self.watches)
+            
+            for watch in watches:
+                watch.samples.append((now, watch.position))
+                while now - watch.samples[0][0] > self.window:
+                    watch.samples.popleft()
+                if now - watch.started < self.window:
                     continue
+                
+                first_time, first_position = watch.samples[0]
+                speed = (watch.position - first_position) / max(now - first_time, self.interval)
+                if speed < self.min_speed:
+                    print(f"⚠️ Download stalled ({format_bytes(speed)}/s over {self.window}s) - cutting connection")
+                    watch.stalled = True
+                    self.unwatch(watch)
+                    shutdown_response(watch.response)
+
+def shutdown_response(response):
+    """Shut down the socket under a streamed response, waking a blocked read"""
+    raw = response.raw
+    sock = getattr(getattr(raw, '_connection', None), 'sock', None)
+    if sock is None:
+        fp = getattr(getattr(raw, '_fp', None), 'fp', None)
+        sock = getattr(getattr(fp, 'raw', None), '_sock', None)
+    try:
+        if sock is not None:
+            sock.shutdown(socket.SHUT_RDWR)
+        else:
+            response.close()
+    except OSError:
+        pass
+
+download_watchdog = DownloadWatchdog(DOWNLOAD_MIN_SPEED, DOWNLOAD_STALL_WINDOW)
+
+# ============================================================================
+# Disk Admission Control
+# ============================================================================
+def sniff_video_container(data):
+    """
+    Identify a file format from its first bytes.
+    
+    Returns:
+        str: Container name ('mkv', 'mp4', 'avi', 'flv', 'asf', 'ts'),
+        'html' for web pages, or None if unknown
+    """
+    if data.startswith(b'\x1a\x45\xdf\xa3'):
+        return 'mkv'  # Matroska / WebM
+    if data[4:8] in (b'ftyp', b'moov', b'mdat', b'free', b'wide'):
+        return 'mp4'
+    if data.startswith(b'RIFF') and data[8:12] == b'AVI ':
+        return 'avi'
+    if data.startswith(b'FLV'):
+        return 'flv'
+    if data.startswith(b'\x30\x26\xb2\x75'):
+        return 'asf'  # WMV
+    # MPEG-TS: a 0x47 sync byte opening every 188-byte packet, two at least
+    syncs = data[::188]
+    if len(syncs) >= 2 and syncs == b'\x47' * len(syncs):
+        return 'ts'
+    
+    head = data[:1024].lstrip(b'\xef\xbb\xbf \t\r\n').lower()
+    if head.startswith(b'<'):  # <!DOCTYPE html>, <html>, <?xml ...
+        return 'html'
+    return None
+
+def claim_file_path(directory, filename):
+    """
+    Create an empty file named filename, or filename_1, filename_2, ... when
+    taken. Creating it claims the name, so concurrent jobs never share one.
+    
+    Returns:
+        str: Path of the created file
+    """
+    base_name, ext = os.path.splitext(filename)
+    counter = 0
+    while True:
+        path = os.path.join(directory, f"{base_name}_{counter}{ext}" if counter else filename)
+        try:
+            os.close(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644))
+            return path
+        except FileExistsError:
+            counter += 1
+
+def preallocate_file(fd, size):
+    """Reserve a file's blocks up front so it is written contiguously"""
+    if not size:
+        return
+    try:
+        os.posix_fallocate(fd, 0, size)
+    except (AttributeError, OSError) as e:
+        if getattr(e, 'errno', None) == errno.ENOSPC:
+            raise
+        # No fallocate (or unsupported filesystem): at least set the length
+        os.ftruncate(fd, size)
+
+class DiskAdmission:
+    """
+    Reserves disk space for downloads before they write anything.
+    A reservation lasts until its job has uploaded (or parked) the file, so
+    files waiting for upload keep new downloads out. Waiting jobs are
+    admitted first come, first served, except that a job asking for more
+    while it holds a reservation goes first: the jobs ahead of it may be
+    waiting for exactly the space it will free.
+    """
+    def __init__(self, path, budget, free_margin):
+        self.path = path
+        self.budget = budget
+        self.free_margin = free_margin
+        self.reservations: Dict[str, int] = {}
+        self.waiting = deque()
+        self.blocked: Dict[object, set] = {}  # ticket -> keys its waiting job holds
+        self.condition = threading.Condition()
+        # Frees bytes from caches on demand: reclaim(bytes) -> bytes freed
+        self.reclaim = None
+
+    def _unwritten(self):
+        """Reserved bytes not on disk yet"""
+        unwritten = 0
+        for key, size in self.reservations.items():
+            written = os.path.getsize(key) if os.path.exists(key) else 0
+            unwritten += max(0, size - written)
+        return unwritten
+
+    def _fits(self, size):
+        # Nothing reserved but by jobs that are waiting here themselves (the
+        # caller included): nobody would free anything, so admit even
+        # oversized jobs rather than wait forever
+        waiting_holders = set().union(*self.blocked.values())
+        if all(key in waiting_holders for key in self.reservations):
+            return True
+        if self.budget and sum(self.reservations.values()) + size > self.budget:
+            return False
+        free = shutil.disk_usage(self.path).free - self._unwritten()
+        if free - size < self.free_margin and self.reclaim:
+            # Cached downloads give way to jobs that need the disk
+            if self.reclaim(self.free_margin - (free - size)):
+                free = shutil.disk_usage(self.path).free - self._unwritten()
+        return free - size >= self.free_margin
+
+    def reserve(self, key, size, progress_callback=None, on_wait=None, held=()):
+        """
+        Reserve bytes for a file, blocking until they fit.
+        Called from download threads.
+        
+        Args:
+            key (str): File path the reservation belongs to
+            size (int): Bytes to reserve
+            progress_callback (callable): Told when the job has to wait
+            on_wait (callable): Called once before waiting (e.g. to let go
+                of a connection that would sit idle)
+            held (iterable): Keys the calling job has reserved already
+        """
+        ticket = object()
+        notified = False
+        with self.condition:
+            held = {held_key for held_key in held if held_key in self.reservations}
+            if held:
+                self.waiting.appendleft(ticket)
+            else:
+                self.waiting.append(ticket)
+            self.blocked[ticket] = held
+            try:
+                while self.waiting[0] is not ticket or not self._fits(size):
+                    if not notified:
+                        print(f"⏳ Waiting for disk space: {os.path.basename(key)} ({size / (1024 * 1024):.0f} MB)")
+                        if progress_callback:
+                            progress_callback("⏳ Waiting for disk space...")
+                        if on_wait:
+                            on_wait()
+                        notified = True
+                    # Uploads finishing elsewhere free space without notifying
+                    self.condition.wait(timeout=10)
+                self.reservations[key] = self.reservations.get(key, 0) + size
+            finally:
+                self.waiting.remove(ticket)
+                del self.blocked[ticket]
+                self.condition.notify_all()
+
+    def release(self, key):
+        """Drop a file's reservation"""
+        with self.condition:
+            if self.reservations.pop(key, None) is not None:
+                self.condition.notify_all()
+
+disk_admission = DiskAdmission(DOWNLOAD_PATH, DISK_BUDGET, DISK_FREE_MARGIN)
+
+# ============================================================================
+# Download Store
+# ============================================================================
+class DownloadStore:
+    """
+    Content-addressed store for finished downloads.
+    Each file is kept once under its SHA-256 in the objects directory and
+    hardlinked to its human-readable name in DOWNLOAD_PATH. Episode links
+    are aliases of a hash, so a repeat request finds the file without
+    resolving or downloading anything. Files in use are never evicted.
+    Besides keeping to its budget, the store gives files up to disk
+    admission when downloads run short of space.
+    """
+    def __init__(self, path, index_file, budget):
+        self.objects_path = os.path.join(path, "objects")
+        self.index_file = index_file
+        self.budget = budget
+        self.entries: Dict[str, Dict] = {}
+        self.aliases: Dict[str, str] = {}
+        self.in_use: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.budget > 0
+
+    def load(self):
+        """Load the store index from JSON, dropping entries whose file is gone"""
+        if not self.enabled:
+            return
+        os.makedirs(self.objects_path, exist_ok=True)
+        index_lost = False
+        try:
+            if os.path.exists(self.index_file):
+                with open(self.index_file, 'r') as f:
+                    data = json.load(f)
+                self.entries = data.get('entries', {})
+                self.aliases = data.get('aliases', {})
+        except Exception as e:
+            print(f"Error loading download store: {e}")
+            self.entries, self.aliases = {}, {}
+            index_lost = True
+        
+        for digest in list(self.entries):
+            if not os.path.exists(self._object_path(digest)):
+                self._remove(digest)
+        
+        unindexed = [name for name in os.listdir(self.objects_path) if name not in self.entries]
+        if index_lost:
+            # Keep the files: rebuild their entries (episode aliases are lost)
+            self._rebuild(unindexed)
+            self.save()
+            return
+        
+        # Objects without an index entry are left over from a crash
+        for name in unindexed:
+            os.remove(os.path.join(self.objects_path, name))
+
+    def _rebuild(self, digests):
+        """Index stored objects again, finding their names by inode"""
+        names_by_inode = {}
+        for name in os.listdir(DOWNLOAD_PATH):
+            path = os.path.join(DOWNLOAD_PATH, name)
+            if os.path.isfile(path):
+                names_by_inode.setdefault(os.stat(path).st_ino, []).append(path)
+        
+        for digest in digests:
+            stat = os.stat(self._object_path(digest))
+            names = names_by_inode.get(stat.st_ino, [])
+            self.entries[digest] = {
+                'size': stat.st_size,
+                'names': names,
+                'filename': os.path.basename(names[0]) if names else None,
+                'last_used': stat.st_mtime
+            }
+        print(f"Rebuilt {len(digests)} download store entries")
+
+    def save(self):
+        """Save the store index to JSON"""
+        try:
+            with open(self.index_file, 'w') as f:
+                json.dump({'entries': self.entries, 'aliases': self.aliases}, f, indent=2)
+        except Exception as e:
+            print(f"Error saving download store: {e}")
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_path, digest)
+
+    def _relink(self, digest):
+        """Give a stored file whose names were all deleted a name again"""
+        entry = self.entries[digest]
+        filename = entry.get('filename')
+        if not filename:
+            return False
+        base_name, ext = os.path.splitext(filename)
+        counter = 0
+        while True:
+            # os.link never replaces a file, so a taken name just moves on
+            filepath = os.path.join(DOWNLOAD_PATH, f"{base_name}_{counter}{ext}" if counter else filename)
+            try:
+                os.link(self._object_path(digest), filepath)
+                break
+            except FileExistsError:
+                counter += 1
+            except OSError as e:
+                print(f"Could not relink stored file: {e}")
+                return False
+        entry['names'].append(filepath)
+        return True
+
+    def _result(self, digest):
+        """Download result for a stored file (which has a name), marking it in use"""
+        entry = self.entries[digest]
+        entry['last_used'] = time.time()
+        self.in_use[digest] = self.in_use.get(digest, 0) + 1
+        filepath = entry['names'][0]
+        return {
+            'success': True,
+            'filepath': filepath,
+            'filename': os.path.basename(filepath),
+            'size_mb': entry['size'] / (1024 * 1024),
+            'sha256': digest
+        }
+
+    def lookup(self, alias):
+        """
+        Find a stored download by alias (episode link).
+        
+        Returns:
+            dict: Download result for the stored file, or None
+        """
+        if not self.enabled:
+            return None
+        with self.lock:
+            digest = self.aliases.get(alias)
+            if not digest or digest not in self.entries:
+                return None
+            entry = self.entries[digest]
+            entry['names'] = [name for name in entry['names'] if os.path.exists(name)]
+            # Callers upload and delete the returned path, so it must be a
+            # name, never the object itself
+            if not os.path.exists(self._object_path(digest)) or not (entry['names'] or self._relink(digest)):
+                self._remove(digest)
+                self.save()
                 return None
+            print(f"🗃️ Found in download store: {os.path.basename(entry['names'][0])}")
+            result = self._result(digest)
+            self.save()
+            return result
+
+    def contains(self, alias):
+        """Whether an alias has a stored file, without marking it in use"""
+        if not self.enabled:
+            return False
+        with self.lock:
+            digest = self.aliases.get(alias)
+            return bool(digest and digest in self.entries and os.path.exists(self._object_path(digest)))
+
+    def add(self, result, aliases=()):
+        """
+        Put a finished download into the store.
+        Content already stored is deduplicated: the new name becomes another
+        hardlink to the existing file.
+        
+        Args:
+            result (dict): Download result with filepath and sha256
+            aliases (iterable): Keys that should find this file later
+            
+        Returns:
+            dict: Download result for the stored file (marked in use)
+        """
+        digest = result.get('sha256')
+        if not self.enabled or not digest:
+            return result
+        
+        filepath = result['filepath']
+        object_path = self._object_path(digest)
+        with self.lock:
+            try:
+                os.makedirs(self.objects_path, exist_ok=True)
+                if digest in self.entries and os.path.exists(object_path):
+                    # Same bytes as a stored file - keep one copy on disk
+                    temp_path = filepath + ".link"
+                    os.link(object_path, temp_path)
+                    os.replace(temp_path, filepath)
+                    print(f"🗃️ Duplicate download, deduplicated: {result['filename']}")
+                else:
+                    os.link(filepath, object_path)
+                    self.entries[digest] = {
+                        'size': os.path.getsize(filepath),
+                        'names': [],
+                        'filename': os.path.basename(filepath),
+                        'last_used': time.time()
+                    }
+            except OSError as e:
+                print(f"Could not add download to store: {e}")
+                return result
+            
+            entry = self.entries[digest]
+            entry.setdefault('filename', os.path.basename(filepath))
+            if filepath not in entry['names']:
+                entry['names'].append(filepath)
+            for alias in aliases:
+                self.aliases[alias] = digest
+            
+            stored = self._result(digest)
+            stored['filepath'] = filepath
+            stored['filename'] = os.path.basename(filepath)
+            self._evict()
+            self.save()
+            return stored
+
+    def owns(self, filepath):
+        """Whether a path is a name of a stored file"""
+        with self.lock:
+            return self._digest_for(filepath) is not None
+
+    def _digest_for(self, filepath):
+        for digest, entry in self.entries.items():
+            if filepath in entry['names']:
+                return digest
+        return None
+
+    def release(self, filepath):
+        """Mark a stored file as no longer in use so it can be evicted"""
+        if not self.enabled:
+            return
+        with self.lock:
+            digest = self._digest_for(filepath)
+            if digest and digest in self.in_use:
+                self.in_use[digest] -= 1
+                if self.in_use[digest] <= 0:
+                    del self.in_use[digest]
+            self._evict()
+            self.save()
+
+    def _evict(self):
+        """Remove least recently used files until the store fits its budget"""
+        total = sum(entry['size'] for entry in self.entries.values())
+        for digest in sorted(self.entries, key=lambda d: self.entries[d]['last_used']):
+            if total <= self.budget:
+                break
+            if digest in self.in_use:
+                continue
+            total -= self.entries[digest]['size']
+            print(f"🗑️ Evicting from download store: {os.path.basename(self.entries[digest]['names'][0]) if self.entries[digest]['names'] else digest}")
+            self._remove(digest)
+
+    def reclaim(self, needed):
+        """
+        Evict least recently used files not in use until needed bytes are
+        freed, whatever the budget. Called by disk admission under pressure.
         
-        print(f"All {max_retries} attempts failed")
-        return None
+        Returns:
+            int: Bytes freed
+        """
+        if not self.enabled:
+            return 0
+        freed = 0
+        with self.lock:
+            for digest in sorted(self.entries, key=lambda d: self.entries[d]['last_used']):
+                if freed >= needed:
+                    break
+                if digest in self.in_use:
+                    continue
+                freed += self.entries[digest]['size']
+                print(f"🗑️ Evicting from download store for disk space: {digest[:12]}")
+                self._remove(digest)
+            if freed:
+                self.save()
+        return freed
+
+    def _remove(self, digest):
+        entry = self.entries.pop(digest, None)
+        for path in ([self._object_path(digest)] + (entry['names'] if entry else [])):
+            if os.path.exists(path):
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    print(f"Error removing stored file: {e}")
+        for alias in [alias for alias, d in self.aliases.items() if d == digest]:
+            del self.aliases[alias]
+
+download_store = DownloadStore(DOWNLOAD_STORE_PATH, DOWNLOAD_STORE_INDEX, DOWNLOAD_STORE_BUDGET)
+disk_admission.reclaim = download_store.reclaim
 
 # ============================================================================
 # Thumbnail Generator
 # ============================================================================
+# ffmpeg/ffprobe jobs run here so they never block the event loop
+media_executor = ThreadPoolExecutor(max_workers=MEDIA_WORKERS, thread_name_prefix="media")
+
+def get_video_duration(video_path):
+    """
+    Get video duration in seconds using ffprobe.
+    
+    Returns:
+        float: Duration in seconds, or None if it could not be read
+    """
+    duration_cmd = [
+        'ffprobe', '-v', 'error', '-show_entries',
+        'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1',
+        video_path
+    ]
+    
+    try:
+        result = subprocess.run(duration_cmd, capture_output=True, text=True)
+        return float(result.stdout.strip())
+    except (OSError, ValueError):
+        return None
+
 def extract_thumbnail_from_video(video_path, output_path=None):
     """
     Extract a random frame from video as thumbnail using ffmpeg.
@@ -631,17 +2590,7 @@ def extract_thumbnail_from_video(video_path, output_path=None):
             output_path = os.path.join(THUMBNAIL_PATH, f"thumb_{int(time.time())}.jpg")
         
         # Get video duration
-        duration_cmd = [
-            'ffprobe', '-v', 'error', '-show_entries',
-            'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1',
-            video_path
-        ]
-        
-        result = subprocess.run(duration_cmd, capture_output=True, text=True)
-        try:
-            duration = float(result.stdout.strip())
-        except ValueError:
-            duration = 60
+        duration = get_video_duration(video_path) or 60
         
         # Pick random time between 10% and 90% of video
         random_time = random.uniform(duration * 0.1, duration * 0.9)
@@ -662,40 +2611,1009 @@ def extract_thumbnail_from_video(video_path, output_path=None):
         print(f"Thumbnail extraction failed: {e}")
         return None
 
+# ============================================================================
+# Media Splitter
+# ============================================================================
+def split_video_by_keyframes(video_path, part_size=SPLIT_PART_SIZE, max_attempts=3):
+    """
+    Split a video into parts below the upload limit without re-encoding.
+    ffmpeg's segment muxer with stream copy can only cut on keyframes, so
+    parts drift around the target size; a split with an oversized part is
+    retried with more, shorter segments.
+    
+    Args:
+        video_path (str): Path to the video file
+        part_size (int): Target size per part in bytes
+        
+    Returns:
+        list: Paths of the parts in order, or None if splitting failed
+    """
+    duration = get_video_duration(video_path)
+    if not duration:
+        return None
+    
+    base_name, ext = os.path.splitext(video_path)
+    pattern = f"{base_name}.part%03d{ext}"
+    parts_count = math.ceil(os.path.getsize(video_path) / part_size)
+    
+    # Matroska keeps every stream; other containers keep video and audio only
+    if ext.lower() in ['.mkv', '.webm']:
+        stream_maps = ['-map', '0']
+    else:
+        stream_maps = ['-map', '0:v:0', '-map', '0:a?']
+    
+    for attempt in range(max_attempts):
+        segment_time = duration / (parts_count + attempt)
+        split_cmd = [
+            'ffmpeg', '-v', 'error', '-i', video_path, *stream_maps,
+            '-c', 'copy', '-f', 'segment', '-segment_time', f"{segment_time:.3f}",
+            '-reset_timestamps', '1', '-y', pattern
+        ]
+        
+        try:
+            subprocess.run(split_cmd, capture_output=True, check=True)
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"Keyframe split failed: {e}")
+            remove_split_parts(video_path)
+            return None
+        
+        parts = list_split_parts(video_path)
+        if parts and all(os.path.getsize(part) <= TELEGRAM_UPLOAD_LIMIT for part in parts):
+            return parts
+        
+        remove_split_parts(video_path)
+    
+    return None
+
+def split_file_by_bytes(file_path, part_size=SPLIT_PART_SIZE):
+    """
+    Split any file into byte ranges named file.ext.001, file.ext.002, ...
+    
+    Returns:
+        list: Paths of the parts in order
+    """
+    parts = []
+    chunk_size = 8 * 1024 * 1024
+    
+    with open(file_path, 'rb') as src:
+        index = 1
+        while True:
+            part_path = f"{file_path}.{index:03d}"
+            written = 0
+            with open(part_path, 'wb') as dst:
+                while written < part_size:
+                    chunk = src.read(min(chunk_size, part_size - written))
+                    if not chunk:
+                        break
+                    dst.write(chunk)
+                    written += len(chunk)
+            
+            if written == 0:
+                os.remove(part_path)
+                break
+            parts.append(part_path)
+            index += 1
+    
+    return parts
+
+def list_split_parts(file_path):
+    """
+    Existing split parts of a file, in order: name.partNNN.ext from the
+    keyframe split and name.ext.NNN from the byte split
+    """
+    base_name, ext = os.path.splitext(os.path.basename(file_path))
+    directory = os.path.dirname(file_path) or "."
+    part_name = re.compile(
+        rf"{re.escape(base_name)}\.part\d{{3,}}{re.escape(ext)}|{re.escape(base_name + ext)}\.\d{{3,}}"
+    )
+    
+    parts = []
+    for name in os.listdir(directory):
+        if part_name.fullmatch(name):
+            parts.append(os.path.join(directory, name))
+    return sorted(parts)
+
+def remove_split_parts(file_path):
+    """Delete split parts of a file"""
+    for part in list_split_parts(file_path):
+        try:
+            os.remove(part)
+        except OSError:
+            pass
+
+def split_for_upload(file_path, as_video=True):
+    """
+    Split a file that exceeds the upload limit.
+    Videos are cut at keyframes; documents, and videos ffmpeg cannot cut,
+    are split by byte ranges.
+    
+    Returns:
+        list: Paths of the parts in order, or None if no split is needed
+    """
+    if os.path.getsize(file_path) <= TELEGRAM_UPLOAD_LIMIT:
+        return None
+    
+    if as_video:
+        parts = split_video_by_keyframes(file_path)
+        if parts:
+            return parts
+        print("Falling back to byte-range split")
+    
+    return split_file_by_bytes(file_path)
+
+# ============================================================================
+# Parallel Upload Engine
+# ============================================================================
+class ParallelUploader:
+    """
+    Uploads file parts over several MTProto media sessions at once.
+    pyrogram's save_file pushes a whole file through one session with four
+    workers; here the parts of a big file are spread over UPLOAD_SESSIONS
+    sessions and the number of in-flight parts is tuned from the measured
+    throughput. The worker limit is shared by all uploads in progress.
+    """
+    PART_SIZE = 512 * 1024  # Telegram's maximum part size
+    BIG_FILE_SIZE = 10 * 1024 * 1024
+    PART_RETRIES = 5
+
+    def __init__(self, client, sessions=UPLOAD_SESSIONS, min_workers=UPLOAD_MIN_WORKERS, max_workers=UPLOAD_MAX_WORKERS):
+        self.client = client
+        self.sessions = sessions
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.worker_limit = min_workers
+        self.in_flight = 0
+        self.condition = asyncio.Condition()
+        self.best_throughput = 0
+        self.flood_until = 0
+
+    async def _acquire(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < self.worker_limit)
+            self.in_flight += 1
+
+    async def _release(self):
+        async with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    async def _adapt(self, sent_bytes):
+        """Grow the worker limit while throughput keeps improving"""
+        last_bytes = 0
+        while True:
+            await asyncio.sleep(UPLOAD_ADAPT_INTERVAL)
+            throughput = (sent_bytes[0] - last_bytes) / UPLOAD_ADAPT_INTERVAL
+            last_bytes = sent_bytes[0]
+
+            async with self.condition:
+                if throughput > self.best_throughput * 1.1 and self.worker_limit < self.max_workers:
+                    self.best_throughput = throughput
+                    self.worker_limit += 2
+                elif throughput < self.best_throughput * 0.7 and self.worker_limit > self.min_workers:
+                    self.worker_limit -= 1
+                self.worker_limit = max(self.min_workers, min(self.max_workers, self.worker_limit))
+                self.condition.notify_all()
+
+    async def save_file(self, path, progress=None, stream=None):
+        """
+        Upload a file to Telegram without sending it.
+        Drop-in replacement for client.save_file.
+
+        Args:
+            path (str): Path of the file to upload
+            progress (callable): Optional async callback (current, total)
+            stream (StreamingDownload): Upload a file that is still being
+                downloaded; each part is sent once its bytes are on disk
+
+        Returns:
+            InputFile/InputFileBig for use in send_uploaded_media
+        """
+        if stream:
+            file_size = stream.upload_size or stream.total_size
+            read_part = stream.read
+        else:
+            file_size = os.path.getsize(path)
+            if file_size <= self.BIG_FILE_SIZE:
+                # pyrogram reports a failed upload by returning None
+                input_file = await self.client.save_file(path, progress=progress)
+                if input_file is None:
+                    raise RuntimeError(f"upload of {os.path.basename(path)} failed")
+                return input_file
+            fd = os.open(path, os.O_RDONLY)
+            read_part = lambda offset, size: os.pread(fd, size, offset)
+
+        file_id = self.client.rnd_id()
+        total_parts = math.ceil(file_size / self.PART_SIZE)
+        parts = asyncio.Queue()
+        for part in range(total_parts):
+            parts.put_nowait(part)
+
+        # Counts against max_concurrent_transmissions like client.save_file
+        async with self.client.save_file_semaphore:
+            sessions = [
+                Session(
+                    self.client, await self.client.storage.dc_id(), await self.client.storage.auth_key(),
+                    await self.client.storage.test_mode(), is_media=True
+                )
+                for _ in range(self.sessions)
+            ]
+            sent_bytes = [0]
+            failed = []
+
+            async def send_part(session, part):
+                data = await asyncio.to_thread(read_part, part * self.PART_SIZE, self.PART_SIZE)
+                rpc = raw.functions.upload.SaveBigFilePart(
+                    file_id=file_id,
+                    file_part=part,
+                    file_total_parts=total_parts,
+                    bytes=data
+                )
+                for attempt in range(self.PART_RETRIES):
+                    try:
+                        await session.invoke(rpc, sleep_threshold=0)
+                        return len(data)
+                    except FloodWait as e:
+                        self.flood_until = max(self.flood_until, time.monotonic() + e.value)
+                        if attempt == self.PART_RETRIES - 1:
+                            raise
+                        await asyncio.sleep(e.value + 1)
+                    except Exception as e:
+                        if attempt == self.PART_RETRIES - 1:
+                            raise
+                        await asyncio.sleep(2 ** attempt)
+
+            async def worker(session):
+                while not failed:
+                    try:
+                        part = parts.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    if stream:
+                        # Wait outside the shared limit so other uploads keep going
+                        try:
+                            await stream.wait_for(min((part + 1) * self.PART_SIZE, file_size))
+                        except RuntimeError as e:
+                            failed.append(part)
+                            print(f"Streaming upload stopped: {e}")
+                            return
+                    await self._acquire()
+                    try:
+                        part_bytes = await send_part(session, part)
+                        sent_bytes[0] += part_bytes
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        print(f"Upload part {part} failed: {e}")
+                        failed.append(part)
+                        return
+                    finally:
+                        await self._release()
+                    if progress:
+                        await progress(min(sent_bytes[0], file_size), file_size)
+
+            adapter = asyncio.create_task(self._adapt(sent_bytes))
+            try:
+                await asyncio.gather(*(session.start() for session in sessions))
+                workers = [
+                    worker(sessions[index % len(sessions)])
+                    for index in range(self.max_workers)
+                ]
+                await asyncio.gather(*workers)
+            finally:
+                adapter.cancel()
+                if not stream:
+                    os.close(fd)
+                await asyncio.gather(*(session.stop() for session in sessions), return_exceptions=True)
+
+        if failed:
+            raise RuntimeError(f"upload of part {failed[0]} failed")
+
+        return raw.types.InputFileBig(id=file_id, parts=total_parts, name=os.path.basename(path))
+
+class StreamingDownload:
+    """
+    Progress callback that lets an upload follow a download in progress.
+    The download thread reports the file path and the bytes written so far;
+    the upload side waits until each part's byte range is on disk, and the
+    last part goes out once Content-Length is reached.
+    The upload follows the file that was open when it started; if the
+    download moves to another file (a retry or another mirror), the upload
+    is cancelled.
+    """
+    def __init__(self, loop, progress_callback=None):
+        self.loop = loop
+        self.progress_callback = progress_callback
+        self.filepath = None
+        self.total_size = 0
+        self.downloaded = 0
+        self.finished = False
+        self.started = asyncio.Event()
+        self.changed = asyncio.Event()
+        # The streaming upload and the file it follows
+        self.upload = None
+        self.upload_path = None
+        self.upload_size = 0
+
+    def __call__(self, stage):
+        if self.progress_callback:
+            self.progress_callback(stage)
+
+    def on_file_start(self, filepath, total_size):
+        """Called from the download thread when a (re)started download opens its file"""
+        if self.upload:
+            # Parts already sent came from the previous file
+            self.loop.call_soon_threadsafe(self.upload.cancel)
+        self.filepath = filepath
+        self.total_size = total_size
+        self.downloaded = 0
+        self.loop.call_soon_threadsafe(self._notify, True)
+
+    def report_bytes(self, done, total):
+        """Called from the download thread as bytes are written"""
+        report_bytes = getattr(self.progress_callback, 'report_bytes', None)
+        if report_bytes:
+            report_bytes(done, total)
+
+        part_size = ParallelUploader.PART_SIZE
+        completed_part = done // part_size != self.downloaded // part_size
+        self.downloaded = done
+        # Only wake the uploader when another part is complete
+        if completed_part or done == total:
+            self.loop.call_soon_threadsafe(self._notify, False)
+
+    def _notify(self, started):
+        if started:
+            self.started.set()
+        self.changed.set()
+
+    def finish(self):
+        """Mark the download as over, successful or not"""
+        self.finished = True
+        self.started.set()
+        self.changed.set()
+
+    @property
+    def streamable(self):
+        """Whether the upload can start before the download ends"""
+        return (
+            self.filepath is not None and not self.finished and
+            ParallelUploader.BIG_FILE_SIZE < self.total_size <= TELEGRAM_UPLOAD_LIMIT
+        )
+
+    async def wait_for(self, end):
+        """Wait until bytes [0, end) are on disk"""
+        while self.downloaded < end:
+            if self.finished:
+                raise RuntimeError("download ended before the upload could finish")
+            self.changed.clear()
+            await self.changed.wait()
+
+    def follow(self, upload):
+        """Tie an upload task to the file open right now"""
+        self.upload = upload
+        self.upload_path = self.filepath
+        self.upload_size = self.total_size
+
+    def read(self, offset, size):
+        """Read a byte range of the file the upload follows"""
+        fd = os.open(self.upload_path or self.filepath, os.O_RDONLY)
+        try:
+            return os.pread(fd, size, offset)
+        finally:
+            os.close(fd)
+
+# ============================================================================
+# Outbound Send Scheduler
+# ============================================================================
+# Sleep threshold for the Telegram calls made in this context (None = the client's)
+flood_sleep_threshold: ContextVar = ContextVar('flood_sleep_threshold', default=None)
+
+class PacedClient(Client):
+    """
+    Client that lets the send scheduler take over FloodWait handling.
+    Calls made through TelegramSendScheduler.call raise every FloodWait so
+    the scheduler can pause the chat; all other calls keep pyrogram's
+    default of sleeping through short waits.
+    """
+    async def invoke(self, query, *args, **kwargs):
+        threshold = flood_sleep_threshold.get()
+        if threshold is not None and len(args) < 3 and kwargs.get('sleep_threshold') is None:
+            kwargs['sleep_threshold'] = threshold
+        return await super().invoke(query, *args, **kwargs)
+
+class TelegramSendScheduler:
+    """
+    Central pacing for outbound Telegram calls.
+    Calls to one chat are serialized in FIFO order and spaced by that chat's
+    interval, while a shared token bucket keeps the total rate under the bot
+    limit. A FloodWait only delays the chat it was raised for.
+    """
+    def __init__(self, global_rate=SEND_GLOBAL_RATE):
+        self.global_rate = global_rate
+        self.tokens = float(global_rate)
+        self.last_refill = time.monotonic()
+        self.global_lock = asyncio.Lock()
+        self.chat_locks: Dict = {}
+        self.chat_ready_at: Dict = {}
+
+    def chat_interval(self, chat_id):
+        """Minimum spacing between two sends to the same chat"""
+        if isinstance(chat_id, int) and get_peer_type_new(chat_id) == "user":
+            return SEND_PRIVATE_INTERVAL
+        return SEND_GROUP_INTERVAL
+
+    async def _take_global_token(self):
+        async with self.global_lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.global_rate, self.tokens + (now - self.last_refill) * self.global_rate)
+                self.last_refill = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.global_rate)
+
+    async def _reserve_slot(self, chat_id):
+        lock = self.chat_locks.setdefault(chat_id, asyncio.Lock())
+        async with lock:
+            delay = self.chat_ready_at.get(chat_id, 0) - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self._take_global_token()
+            self.chat_ready_at[chat_id] = time.monotonic() + self.chat_interval(chat_id)
+
+    async def call(self, chat_id, func, *args, **kwargs):
+        """
+        Run a Telegram API call once the chat's pacing allows it.
+
+        Args:
+            chat_id: Chat the call sends to (used for pacing only)
+            func (callable): Coroutine function, e.g. client.send_message
+
+        Returns:
+            The result of the call
+        """
+        for attempt in range(SEND_MAX_FLOOD_RETRIES + 1):
+            await self._reserve_slot(chat_id)
+            token = flood_sleep_threshold.set(0)
+            try:
+                return await func(*args, **kwargs)
+            except FloodWait as e:
+                if attempt == SEND_MAX_FLOOD_RETRIES:
+                    raise
+                print(f"FloodWait for chat {chat_id}: pausing it for {e.value}s")
+                self.chat_ready_at[chat_id] = max(
+                    self.chat_ready_at.get(chat_id, 0),
+                    time.monotonic() + e.value + 1
+                )
+            finally:
+                flood_sleep_threshold.reset(token)
+
+    async def send_message(self, client, chat_id, text, **kwargs):
+        return await self.call(chat_id, client.send_message, chat_id, text, **kwargs)
+
+    async def reply_text(self, message, text, **kwargs):
+        return await self.call(message.chat.id, message.reply_text, text, **kwargs)
+
+    async def edit_text(self, message, text, **kwargs):
+        return await self.call(message.chat.id, message.edit_text, text, **kwargs)
+
+# ============================================================================
+# Progress Reporter
+# ============================================================================
+def format_bytes(num_bytes):
+    """Human readable byte count"""
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if num_bytes < 1024 or unit == 'GB':
+            return f"{num_bytes:.1f} {unit}" if unit != 'B' else f"{int(num_bytes)} B"
+        num_bytes /= 1024
+
+def format_duration(seconds):
+    """Human readable duration like 1h 02m or 3m 05s"""
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {(seconds % 3600) // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds}s"
+
+class ProgressReporter:
+    """
+    Coalesces progress updates for one status message.
+    Download threads may report as often as they like; the message is edited
+    at most once per interval, and only when the rendered text changed.
+
+    The reporter is also a plain progress_callback: calling it with a string
+    sets the current stage line.
+    """
+    def __init__(self, message, header="", interval=PROGRESS_EDIT_INTERVAL):
+        self.message = message
+        self.header = header
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.stage = ""
+        self.transfers: Dict[str, Dict] = {}
+        self.last_text = None
+        self.task = None
+
+    def __call__(self, stage):
+        with self.lock:
+            self.stage = stage
+
+    def set_header(self, header):
+        with self.lock:
+            self.header = header
+            self.stage = ""
+            self.transfers.clear()
+
+    def report_bytes(self, done, total, label="📥 Downloading"):
+        """
+        Record transferred bytes; safe to call from any thread.
+        Each label is its own transfer line, so a download and an upload
+        running at the same time are both shown.
+        """
+        now = time.monotonic()
+        with self.lock:
+            transfer = self.transfers.setdefault(label, {'samples': deque(maxlen=20)})
+            if transfer['samples'] and done < transfer['samples'][-1][1]:
+                transfer['samples'].clear()  # restarted
+            transfer['done'] = done
+            transfer['total'] = total
+            if not transfer['samples'] or now - transfer['samples'][-1][0] >= 0.5:
+                transfer['samples'].append((now, done))
+
+    def render(self):
+        with self.lock:
+            lines = [self.header] if self.header else []
+            if self.stage:
+                lines.append(self.stage)
+            for label, transfer in self.transfers.items():
+                done = transfer['done']
+                total = transfer['total']
+                line = f"{label}: {format_bytes(done)}"
+                if total:
+                    line += f" / {format_bytes(total)} ({done / total * 100:.1f}%)"
+                lines.append(line)
+
+                samples = transfer['samples']
+                if len(samples) >= 2 and (not total or done < total):
+                    (t0, b0), (t1, b1) = samples[0], samples[-1]
+                    speed = (b1 - b0) / (t1 - t0) if t1 > t0 else 0
+                    if speed > 0:
+                        speed_line = f"⚡ {format_bytes(speed)}/s"
+                        if total and total > done:
+                            speed_line += f" | ETA {format_duration((total - done) / speed)}"
+                        lines.append(speed_line)
+            return "\n".join(lines)
+
+    async def flush(self, text=None):
+        """Edit the status message if the text changed"""
+        text = text or self.render()
+        if not text or text == self.last_text:
+            return
+        self.last_text = text
+        try:
+            await send_scheduler.edit_text(self.message, text)
+        except Exception as e:
+            print(f"Progress update failed: {e}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    def start(self):
+        """Begin periodic edits"""
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+        return self
+
+    async def stop(self, final_text=None):
+        """Stop periodic edits and optionally show a final text"""
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        if final_text:
+            await self.flush(final_text)
+
+# ============================================================================
+# Multi-Bot Upload Pool
+# ============================================================================
+class UploadBot:
+    """One bot account used for uploads, with its own pacing and load stats"""
+    DEFAULT_THROUGHPUT = 5 * 1024 * 1024  # assumed bytes/s before the first upload
+
+    def __init__(self, client):
+        self.client = client
+        self.uploader = ParallelUploader(client)
+        self.scheduler = TelegramSendScheduler()
+        self.active = 0
+        self.throughput = 0.0
+        self.flood_until = 0
+
+    def flood_remaining(self):
+        """Seconds until this bot is out of FloodWait"""
+        return max(self.flood_until, self.uploader.flood_until) - time.monotonic()
+
+    def estimated_wait(self):
+        """Rough cost of giving this bot one more upload"""
+        throughput = self.throughput or self.DEFAULT_THROUGHPUT
+        return max(0, self.flood_remaining()) + (self.active + 1) * (1024 * 1024 * 1024) / throughput
+
+class UploadBotPool:
+    """
+    Helper bots that share the upload work.
+    Each upload goes to the helper with the lowest estimated wait, judged by
+    its FloodWait state, uploads in flight and measured throughput.
+    """
+    def __init__(self, tokens):
+        self.bots = [
+            UploadBot(PacedClient(
+                f"upload_helper_{index}",
+                api_id=API_ID,
+                api_hash=API_HASH,
+                bot_token=token,
+                no_updates=True,
+                max_concurrent_transmissions=MAX_CONCURRENT_UPLOADS
+            ))
+            for index, token in enumerate(tokens)
+        ]
+        self.started = False
+
+    @property
+    def enabled(self):
+        # Helpers take uploads only once every one of them has started
+        return self.started and bool(self.bots) and bool(STORAGE_CHANNEL_ID)
+
+    async def start(self):
+        for bot in list(self.bots):
+            try:
+                await bot.client.start()
+                print(f"🤖 Upload helper ready: @{bot.client.me.username}")
+            except Exception as e:
+                print(f"Upload helper failed to start: {e}")
+                self.bots.remove(bot)
+        self.started = True
+    
+    async def stop(self):
+        self.started = False
+        for bot in self.bots:
+            if not bot.client.is_connected:
+                continue
+            try:
+                await bot.client.stop()
+            except Exception:
+                pass
+
+    def acquire(self):
+        """Pick the helper for the next upload"""
+        bot = min(self.bots, key=lambda b: b.estimated_wait())
+        bot.active += 1
+        return bot
+
+    def release(self, bot, size=0, elapsed=0, error=None):
+        """Return a helper and record how its upload went"""
+        bot.active -= 1
+        if isinstance(error, FloodWait):
+            bot.flood_until = max(bot.flood_until, time.monotonic() + error.value)
+        elif size and elapsed > 0:
+            speed = size / elapsed
+            bot.throughput = speed if not bot.throughput else 0.7 * bot.throughput + 0.3 * speed
+
 # ============================================================================
 # Pyrogram Bot
 # ============================================================================
-app = Client(
+app = PacedClient(
     "drama_bot",
     api_id=API_ID,
     api_hash=API_HASH,
-    bot_token=BOT_TOKEN
+    bot_token=BOT_TOKEN,
+    max_concurrent_transmissions=MAX_CONCURRENT_UPLOADS
 )
 
-user_sessions: Dict[int, Dict] = {}
-user_settings: Dict[int, Dict] = {}
-monitor_data: Dict[int, List] = {}
+send_scheduler = TelegramSendScheduler()
+parallel_uploader = ParallelUploader(app)
+upload_pool = UploadBotPool(HELPER_BOT_TOKENS)
+
+user_sessions: Dict[int, Dict] = {}
+episode_prefetch: Dict[int, Dict] = {}
+user_settings: Dict[int, Dict] = {}
+monitor_data: Dict[int, List] = {}
+
+def load_monitor_data():
+    """Load monitoring data from JSON file"""
+    global monitor_data
+    try:
+        if os.path.exists(MONITOR_FILE):
+            with open(MONITOR_FILE, 'r') as f:
+                monitor_data = json.load(f)
+                # Convert string keys back to integers
+                monitor_data = {int(k): v for k, v in monitor_data.items()}
+    except Exception as e:
+        print(f"Error loading monitor data: {e}")
+        monitor_data = {}
+
+def save_monitor_data():
+    """Save monitoring data to JSON file"""
+    try:
+        with open(MONITOR_FILE, 'w') as f:
+            json.dump(monitor_data, f, indent=2)
+    except Exception as e:
+        print(f"Error saving monitor data: {e}")
+
+# ============================================================================
+# Upload Retry Area
+# ============================================================================
+pending_uploads: Dict[str, Dict] = {}
+
+def load_pending_uploads():
+    """Load parked upload entries from JSON file"""
+    global pending_uploads
+    try:
+        if os.path.exists(UPLOAD_RETRY_FILE):
+            with open(UPLOAD_RETRY_FILE, 'r') as f:
+                pending_uploads = json.load(f)
+    except Exception as e:
+        print(f"Error loading pending uploads: {e}")
+        pending_uploads = {}
+
+def save_pending_uploads():
+    """Save parked upload entries to JSON file"""
+    try:
+        with open(UPLOAD_RETRY_FILE, 'w') as f:
+            json.dump(pending_uploads, f, indent=2)
+    except Exception as e:
+        print(f"Error saving pending uploads: {e}")
+
+def park_failed_upload(episode, result):
+    """
+    Move a downloaded file into the retry area after its upload failed.
+    The file is kept for UPLOAD_RETRY_TTL seconds so the next attempt
+    only has to redo the upload.
+
+    Args:
+        episode (dict): Episode dict with download link
+        result (dict): Download result from the scraper
+
+    Returns:
+        dict: Download result pointing at the parked file
+    """
+    os.makedirs(UPLOAD_RETRY_PATH, exist_ok=True)
+
+    filepath = result['filepath']
+    parked_path = os.path.join(UPLOAD_RETRY_PATH, result['filename'])
+
+    if os.path.abspath(filepath) != os.path.abspath(parked_path):
+        base_name, ext = os.path.splitext(result['filename'])
+        counter = 1
+        while os.path.exists(parked_path):
+            parked_path = os.path.join(UPLOAD_RETRY_PATH, f"{base_name}_{counter}{ext}")
+            counter += 1
+        if download_store.owns(filepath):
+            # Another hardlink: the parked copy survives store eviction for free
+            os.link(filepath, parked_path)
+        else:
+            shutil.move(filepath, parked_path)
+
+    parked = dict(result, filepath=parked_path, filename=os.path.basename(parked_path))
+    pending_uploads[episode['download_link']] = {
+        'filepath': parked['filepath'],
+        'filename': parked['filename'],
+        'size_mb': parked['size_mb'],
+        'title': episode['title'],
+        'expires': time.time() + UPLOAD_RETRY_TTL
+    }
+    save_pending_uploads()
+    return parked
+
+def take_parked_upload(episode):
+    """
+    Get a previously downloaded file for this episode from the retry area.
+
+    Returns:
+        dict: Download result for the parked file, or None if there is none
+    """
+    entry = pending_uploads.get(episode['download_link'])
+    if not entry:
+        return None
+
+    if entry['expires'] < time.time() or not os.path.exists(entry['filepath']):
+        discard_parked_upload(episode['download_link'])
+        return None
+
+    print(f"♻️ Reusing parked download: {entry['filename']}")
+    return {
+        'success': True,
+        'filepath': entry['filepath'],
+        'filename': entry['filename'],
+        'size_mb': entry['size_mb']
+    }
+
+def discard_parked_upload(download_link):
+    """Remove a retry-area entry and its file"""
+    entry = pending_uploads.pop(download_link, None)
+    if entry:
+        if os.path.exists(entry['filepath']):
+            try:
+                os.remove(entry['filepath'])
+            except OSError as e:
+                print(f"Error removing parked file: {e}")
+        save_pending_uploads()
+
+def cleanup_expired_uploads():
+    """Garbage-collect expired retry-area entries and orphaned files"""
+    now = time.time()
+    for download_link, entry in list(pending_uploads.items()):
+        if entry['expires'] < now:
+            print(f"🗑️ Parked upload expired: {entry['title']}")
+            discard_parked_upload(download_link)
+
+    if os.path.isdir(UPLOAD_RETRY_PATH):
+        known = {os.path.abspath(e['filepath']) for e in pending_uploads.values()}
+        for name in os.listdir(UPLOAD_RETRY_PATH):
+            path = os.path.abspath(os.path.join(UPLOAD_RETRY_PATH, name))
+            if path not in known and os.path.isfile(path):
+                os.remove(path)
+
+async def upload_with_retry(send, description="upload"):
+    """
+    Run a Telegram upload with backoff, honoring FloodWait durations.
+
+    Args:
+        send (callable): Zero-argument coroutine function performing the upload
+        description (str): Label used in log output
+
+    Returns:
+        The result of the upload call
+
+    Raises:
+        Exception: The last error once UPLOAD_MAX_ATTEMPTS is exhausted
+    """
+    for attempt in range(UPLOAD_MAX_ATTEMPTS):
+        try:
+            return await send()
+        except FloodWait as e:
+            if attempt == UPLOAD_MAX_ATTEMPTS - 1:
+                raise
+            print(f"FloodWait on {description}: sleeping {e.value}s")
+            await asyncio.sleep(e.value + 1)
+        except Exception as e:
+            if attempt == UPLOAD_MAX_ATTEMPTS - 1:
+                raise
+            delay = 5 * (2 ** attempt)
+            print(f"{description} attempt {attempt + 1} failed: {e} - retrying in {delay}s")
+            await asyncio.sleep(delay)
+
+# ============================================================================
+# Storage Channel Archive
+# ============================================================================
+archive_index: Dict[str, Dict] = {}
 
-def load_monitor_data():
-    """Load monitoring data from JSON file"""
-    global monitor_data
+ARCHIVE_TAG_PATTERN = re.compile(
+    r'#archive\nurl: (?P<url>.+)\nseason: (?P<season>.*)\ntitle: (?P<title>.+)'
+    r'(?:\npart: (?P<part>\d+)/(?P<parts>\d+))?'
+)
+
+def load_archive_index():
+    """Load the storage channel archive index from JSON file"""
+    global archive_index
     try:
-        if os.path.exists(MONITOR_FILE):
-            with open(MONITOR_FILE, 'r') as f:
-                monitor_data = json.load(f)
-                # Convert string keys back to integers
-                monitor_data = {int(k): v for k, v in monitor_data.items()}
+        if os.path.exists(ARCHIVE_INDEX_FILE):
+            with open(ARCHIVE_INDEX_FILE, 'r') as f:
+                archive_index = json.load(f)
     except Exception as e:
-        print(f"Error loading monitor data: {e}")
-        monitor_data = {}
+        print(f"Error loading archive index: {e}")
+        archive_index = {}
 
-def save_monitor_data():
-    """Save monitoring data to JSON file"""
+def save_archive_index():
+    """Save the storage channel archive index to JSON file"""
     try:
-        with open(MONITOR_FILE, 'w') as f:
-            json.dump(monitor_data, f, indent=2)
+        with open(ARCHIVE_INDEX_FILE, 'w') as f:
+            json.dump(archive_index, f, indent=2)
     except Exception as e:
-        print(f"Error saving monitor data: {e}")
+        print(f"Error saving archive index: {e}")
+
+def archive_key(drama_url, season, title):
+    """Archive index key for one episode"""
+    return f"{drama_url}|{season or ''}|{title}"
+
+def archive_code(value):
+    """
+    Caption code span that reads back as exactly value: markdown is not
+    parsed inside it, and the HTML pass turns the escapes back into text
+    """
+    return f"`{html.escape(str(value)).replace('`', '&#96;')}`"
+
+def archive_tag(drama_url, episode, part=None, parts=None):
+    """
+    Machine-readable caption block for archived messages.
+    It lets rebuild_archive_index recover the key from the channel itself,
+    so the values are written the way archive_key reads them.
+    """
+    tag = (
+        f"\n\n#archive\n"
+        f"url: {archive_code(drama_url)}\n"
+        f"season: {archive_code(episode.get('season') or '')}\n"
+        f"title: {archive_code(episode['title'])}"
+    )
+    if parts and parts > 1:
+        tag += f"\npart: {part}/{parts}"
+    return tag
+
+def record_archive_entry(key, sent_parts, size_mb):
+    """Index archived messages (one per part) by episode key"""
+    archive_index[key] = {
+        'chat_id': sent_parts[0].chat.id,
+        'message_ids': [sent.id for sent in sent_parts],
+        'size_mb': size_mb,
+        'archived': datetime.now().strftime("%Y-%m-%d %H:%M")
+    }
+    save_archive_index()
+
+async def rebuild_archive_index(client, batch_size=200, max_empty_batches=5):
+    """
+    Rebuild the archive index by scanning the storage channel.
+    Bots cannot read chat history, so messages are fetched by ID in batches
+    until several consecutive batches come back empty.
+
+    Returns:
+        int: Number of indexed episodes
+    """
+    found_parts = {}
+    start_id = 1
+    empty_batches = 0
+
+    while empty_batches < max_empty_batches:
+        messages = await send_scheduler.call(
+            STORAGE_CHANNEL_ID,
+            client.get_messages,
+            STORAGE_CHANNEL_ID,
+            list(range(start_id, start_id + batch_size))
+        )
+        found = False
+
+        for msg in messages:
+            if not msg or msg.empty:
+                continue
+            found = True
+
+            media = msg.video or msg.document
+            match = ARCHIVE_TAG_PATTERN.search(msg.caption or "")
+            if not media or not match:
+                continue
+
+            key = archive_key(match.group('url'), match.group('season'), match.group('title'))
+            part = int(match.group('part') or 1)
+            parts = int(match.group('parts') or 1)
+            found_parts.setdefault((key, parts), {})[part] = msg
+
+        empty_batches = 0 if found else empty_batches + 1
+        start_id += batch_size
+
+    # Keep only complete uploads; the latest one wins for each key
+    rebuilt = {}
+    for (key, parts), messages in found_parts.items():
+        if len(messages) != parts:
+            continue
+        ordered = [messages[part] for part in range(1, parts + 1)]
+        first = ordered[0]
+        entry = {
+            'chat_id': first.chat.id,
+            'message_ids': [msg.id for msg in ordered],
+            'size_mb': sum((msg.video or msg.document).file_size for msg in ordered) / (1024 * 1024),
+            'archived': first.date.strftime("%Y-%m-%d %H:%M") if first.date else None
+        }
+        if key not in rebuilt or rebuilt[key]['message_ids'][0] < entry['message_ids'][0]:
+            rebuilt[key] = entry
+
+    archive_index.clear()
+    archive_index.update(rebuilt)
+    save_archive_index()
+    return len(rebuilt)
 
 def get_user_settings(user_id):
     """
@@ -737,6 +3655,44 @@ async def get_upload_chat_id(user_id):
 
 scraper = DramaEpisodeScraper()
 
+def prefetch_episodes(user_id, results):
+    """
+    Fetch the episode lists of the top search results in the background,
+    replacing the user's earlier prefetch. Unclaimed lists are dropped
+    after PREFETCH_TTL seconds.
+    """
+    cancel_prefetch(user_id)
+    if not SEARCH_PREFETCH:
+        return
+    
+    tasks = {
+        result['url']: asyncio.ensure_future(asyncio.to_thread(scraper.scrape_episodes, result['url']))
+        for result in results[:SEARCH_PREFETCH]
+    }
+    timer = asyncio.get_running_loop().call_later(PREFETCH_TTL, cancel_prefetch, user_id)
+    episode_prefetch[user_id] = {'tasks': tasks, 'timer': timer}
+
+def cancel_prefetch(user_id, keep=None):
+    """
+    Drop a user's prefetched episode lists.
+    A scrape already running finishes in its thread; its result is discarded.
+    
+    Args:
+        user_id (int): Telegram user ID
+        keep (str): Drama URL whose task is returned instead of cancelled
+        
+    Returns:
+        asyncio.Task: The kept task, or None
+    """
+    prefetch = episode_prefetch.pop(user_id, None)
+    if not prefetch:
+        return None
+    prefetch['timer'].cancel()
+    kept = prefetch['tasks'].pop(keep, None)
+    for task in prefetch['tasks'].values():
+        task.cancel()
+    return kept
+
 # ============================================================================
 # Bot Commands
 # ============================================================================
@@ -893,6 +3849,7 @@ async def clear_thumbnail_command(client: Client, message: Message):
 async def cancel_command(client: Client, message: Message):
     """Cancel current operation"""
     user_id = message.from_user.id
+    cancel_prefetch(user_id)
     if user_id in user_sessions:
         del user_sessions[user_id]
         await message.reply_text("✅ Operation cancelled.")
@@ -952,7 +3909,7 @@ async def search_command(client: Client, message: Message):
     
     status_msg = await message.reply_text(f"🔍 Searching for **{search_term}**...")
     
-    results = scraper.search_drama(search_term)
+    results = await asyncio.to_thread(scraper.search_drama, search_term)
     
     if not results:
         await status_msg.edit_text("❌ No results found. Try a different name.")
@@ -963,6 +3920,9 @@ async def search_command(client: Client, message: Message):
         'search_term': search_term
     }
     
+    # Load the likely picks while the user reads the list
+    prefetch_episodes(user_id, results)
+    
     keyboard = []
     for result in results[:10]:  # Limit to 10 results
         keyboard.append([
@@ -1005,14 +3965,14 @@ async def test_monitor_command(client: Client, message: Message):
     
     for idx, drama in enumerate(monitor_data[user_id], 1):
         try:
-            await status_msg.edit_text(
+            await send_scheduler.edit_text(status_msg,
                 f"🧪 **Testing Monitor**\n\n"
                 f"Checking: {drama['title']}\n"
                 f"Progress: {idx}/{len(monitor_data[user_id])}"
             )
             
             # Scrape current episodes
-            current_episodes = scraper.scrape_episodes(drama['url'])
+            current_episodes = await asyncio.to_thread(scraper.scrape_episodes, drama['url'])
             current_total = sum(len(eps) for eps in current_episodes.values())
             
             old_count = drama['episode_count']
@@ -1041,18 +4001,19 @@ async def test_monitor_command(client: Client, message: Message):
                     
                     new_episodes = all_current[old_count:]
                     
-                    upload_success = 0
-                    for episode in new_episodes:
-                        success = await download_and_upload_episode(
+                    async def deliver(episode, mirrors):
+                        return await download_and_upload_episode(
                             client,
                             message,
                             user_id,
                             episode,
                             silent=True,
-                            drama_title=drama['title']
+                            drama_title=drama['title'],
+                            drama_url=drama['url'],
+                            mirrors=mirrors
                         )
-                        if success:
-                            upload_success += 1
+                    
+                    upload_success = sum(await run_episode_batch(new_episodes, deliver))
                     
                     result_text += f"   ✅ Uploaded: {upload_success}/{new_count}\n"
                     
@@ -1076,7 +4037,7 @@ async def test_monitor_command(client: Client, message: Message):
     report += f"\n\n**Settings:**\n"
     report += f"Auto-Upload: {'✅ Enabled' if settings['monitor_auto_upload'] else '❌ Disabled'}"
     
-    await status_msg.edit_text(report)
+    await send_scheduler.edit_text(status_msg, report)
 
 
 @app.on_message(filters.command("forcemonitor"))
@@ -1129,7 +4090,7 @@ async def force_test_callback(client: Client, callback_query):
     
     try:
         # Scrape episodes
-        episodes = scraper.scrape_episodes(drama['url'])
+        episodes = await asyncio.to_thread(scraper.scrape_episodes, drama['url'])
         
         # Get the last episode
         all_episodes = []
@@ -1161,7 +4122,8 @@ async def force_test_callback(client: Client, callback_query):
             user_id,
             latest_episode,
             silent=False,
-            drama_title=drama['title']  # This is the key - passing the correct name!
+            drama_title=drama['title'],  # This is the key - passing the correct name!
+            drama_url=drama['url']
         )
         
         if success:
@@ -1215,6 +4177,30 @@ async def debug_session_command(client: Client, message: Message):
     
     await message.reply_text(debug_info)
 
+
+@app.on_message(filters.command("rebuildarchive"))
+async def rebuild_archive_command(client: Client, message: Message):
+    """
+    Rebuild the archive index by scanning the storage channel.
+    Restricted to ADMIN_IDS.
+    """
+    if message.from_user.id not in ADMIN_IDS:
+        await message.reply_text("❌ This command is for bot admins only.")
+        return
+    
+    if not STORAGE_CHANNEL_ID:
+        await message.reply_text("❌ No storage channel configured.")
+        return
+    
+    status_msg = await message.reply_text("🗄️ Scanning storage channel...")
+    
+    try:
+        count = await rebuild_archive_index(client)
+        await status_msg.edit_text(f"✅ Archive index rebuilt: {count} episodes")
+    except Exception as e:
+        await status_msg.edit_text(f"❌ Rebuild failed: {str(e)}")
+        print(f"Archive rebuild error: {e}")
+
 # ============================================================================
 
 
@@ -1462,9 +4448,20 @@ async def drama_selected(client: Client, callback_query):
         await callback_query.answer("❌ Invalid selection.", show_alert=True)
         return
     
-    await callback_query.message.edit_text("⏳ Loading episodes...")
+    # Use the prefetched list when this result was prefetched; the others are dropped
+    episodes = None
+    prefetched = cancel_prefetch(user_id, keep=selected_drama['url'])
+    if prefetched:
+        if not prefetched.done():
+            await callback_query.message.edit_text("⏳ Loading episodes...")
+        try:
+            episodes = await prefetched
+        except Exception as e:
+            print(f"Episode prefetch failed: {e}")
     
-    episodes = scraper.scrape_episodes(selected_drama['url'])
+    if not episodes:
+        await callback_query.message.edit_text("⏳ Loading episodes...")
+        episodes = await asyncio.to_thread(scraper.scrape_episodes, selected_drama['url'])
     
     if not episodes:
         await callback_query.message.edit_text("❌ No episodes found for this drama.")
@@ -1625,6 +4622,9 @@ async def season_selected(client: Client, callback_query):
     )
     
     await callback_query.answer()
+    
+    # Resolve the likely picks while the user is choosing
+    await speculate(user_id, season_episodes[:SPECULATIVE_BUDGET])
 
 @app.on_callback_query(filters.regex(r"^episode_"))
 async def episode_selected(client: Client, callback_query):
@@ -1649,6 +4649,11 @@ async def episode_selected(client: Client, callback_query):
     
     await callback_query.answer()
     await download_and_upload_episode(client, callback_query.message, user_id, episode)
+    
+    # The next episode is the likely next pick
+    season_episodes = episodes[season_name]
+    position = season_episodes.index(episode)
+    await speculate(user_id, season_episodes[position + 1:position + 2])
 
 @app.on_callback_query(filters.regex(r"^download_all$"))
 async def download_all_callback(client: Client, callback_query):
@@ -1668,24 +4673,31 @@ async def download_season_callback(client: Client, callback_query):
     
     await callback_query.answer()
     
-    status_msg = await callback_query.message.reply_text(
+    status_msg = await send_scheduler.reply_text(callback_query.message,
         f"📥 **Starting Download**\n\n"
         f"Season: {season_name}\n"
         f"Episodes: {len(season_episodes)}\n\n"
         f"Progress: 0/{len(season_episodes)}"
     )
+    reporter = ProgressReporter(status_msg).start()
+    done = 0
     
-    for idx, episode in enumerate(season_episodes, 1):
-        await status_msg.edit_text(
+    async def deliver(episode, mirrors):
+        nonlocal done
+        reporter.set_header(
             f"📥 **Downloading**\n\n"
             f"Season: {season_name}\n"
-            f"Progress: {idx}/{len(season_episodes)}\n\n"
+            f"Progress: {done + 1}/{len(season_episodes)}\n\n"
             f"Current: Episode {episode['number']}"
         )
         
-        await download_and_upload_episode(client, callback_query.message, user_id, episode, silent=True)
+        success = await download_and_upload_episode(client, callback_query.message, user_id, episode, silent=True, reporter=reporter, mirrors=mirrors)
+        done += 1
+        return success
     
-    await status_msg.edit_text(
+    await run_episode_batch(season_episodes, deliver)
+    
+    await reporter.stop(
         f"✅ **Download Complete!**\n\n"
         f"Season: {season_name}\n"
         f"Downloaded: {len(season_episodes)} episodes"
@@ -1748,9 +4760,254 @@ async def back_navigation(client: Client, callback_query):
 # Download & Upload Functions
 # ============================================================================
 
-async def download_and_upload_episode(client: Client, message: Message, user_id: int, episode: dict, silent: bool = False, drama_title: str = None):
+def part_captions(caption: str, parts: int):
+    """Per-part captions like 'Part 1/3' for split uploads"""
+    if parts <= 1:
+        return [caption]
+    return [f"{caption}\n📦 Part {index}/{parts}" for index in range(1, parts + 1)]
+
+async def send_uploaded_media(client: Client, chat_id, path: str, input_file, caption: str, as_video: bool = True, thumb_path: str = None, duration: int = 0):
+    """
+    Send a file that was already uploaded with save_file.
+    Lets uploads run concurrently while messages are still sent in order.
+    
+    Returns:
+        Message: The sent message
+    """
+    file_name = os.path.basename(path)
+    attributes = [raw.types.DocumentAttributeFilename(file_name=file_name)]
+    if as_video:
+        attributes.insert(0, raw.types.DocumentAttributeVideo(
+            supports_streaming=True,
+            duration=duration,
+            w=0,
+            h=0
+        ))
+    
+    media = raw.types.InputMediaUploadedDocument(
+        mime_type=client.guess_mime_type(file_name) or ("video/mp4" if as_video else "application/octet-stream"),
+        file=input_file,
+        thumb=await client.save_file(thumb_path) if thumb_path else None,
+        force_file=None if as_video else True,
+        attributes=attributes
+    )
+    
+    for attempt in range(MAX_PART_REUPLOADS + 1):
+        try:
+            r = await client.invoke(
+                raw.functions.messages.SendMedia(
+                    peer=await client.resolve_peer(chat_id),
+                    media=media,
+                    random_id=client.rnd_id(),
+                    **await utils.parse_text_entities(client, caption, None, None)
+                )
+            )
+        except FilePartMissing as e:
+            if attempt == MAX_PART_REUPLOADS:
+                raise
+            await client.save_file(path, file_id=input_file.id, file_part=e.value)
+        else:
+            for update in r.updates:
+                if isinstance(update, (raw.types.UpdateNewMessage, raw.types.UpdateNewChannelMessage)):
+                    return await types.Message._parse(
+                        client, update.message,
+                        {user.id: user for user in r.users},
+                        {chat.id: chat for chat in r.chats}
+                    )
+            return None
+
+async def upload_parts(client: Client, chat_id, parts: list, captions: list, as_video: bool = True, thumb_path: str = None, reporter: ProgressReporter = None, input_files: list = None, uploader: ParallelUploader = None, scheduler: TelegramSendScheduler = None):
+    """
+    Upload files with the parallel upload engine, all parts concurrently,
+    then send them to the chat in order. A single file is one part.
+    Pass input_files when the parts were already uploaded (streaming).
+    Pass uploader/scheduler when a helper bot is the client.
+    
+    Returns:
+        list: Sent messages, one per part
+    """
+    uploader = uploader or parallel_uploader
+    scheduler = scheduler or send_scheduler
+    total = sum(os.path.getsize(part) for part in parts)
+    uploaded = {}
+    label = f"📤 Uploading {len(parts)} parts" if len(parts) > 1 else "📤 Uploading"
+    
+    async def upload(index, path):
+        async def progress(current, _total):
+            uploaded[index] = current
+            if reporter:
+                reporter.report_bytes(sum(uploaded.values()), total, label=label)
+        
+        async def save():
+            return await uploader.save_file(path, progress=progress)
+        
+        return await upload_with_retry(save, description=f"upload of {os.path.basename(path)}")
+    
+    if input_files is None:
+        input_files = await asyncio.gather(*(upload(index, path) for index, path in enumerate(parts)))
+    
+    loop = asyncio.get_running_loop()
+    sent_parts = []
+    for index, (path, input_file, caption) in enumerate(zip(parts, input_files, captions), 1):
+        if input_file is None:
+            raise RuntimeError(f"upload of part {index}/{len(parts)} failed")
+        
+        duration = 0
+        if as_video:
+            duration = int(await loop.run_in_executor(media_executor, get_video_duration, path) or 0)
+        
+        async def send():
+            return await scheduler.call(
+                chat_id,
+                send_uploaded_media,
+                client, chat_id, path, input_file, caption,
+                as_video=as_video,
+                thumb_path=thumb_path,
+                duration=duration
+            )
+        
+        sent = await upload_with_retry(send, description=f"part {index}/{len(parts)}")
+        if not sent:
+            raise RuntimeError(f"sending part {index}/{len(parts)} failed")
+        sent_parts.append(sent)
+    
+    return sent_parts
+
+async def fan_out_upload(client: Client, sent: Message, destinations: list, caption: str, copy: bool = False):
+    """
+    Deliver an already uploaded video/document to more chats by file_id,
+    without uploading the bytes again.
+    
+    Args:
+        client: Pyrogram client
+        sent: Message returned by the original upload
+        destinations: Chat IDs to deliver to
+        caption: Caption for the delivered copies
+        copy: Copy the message instead (file_ids only work for the bot that
+            uploaded the file, so uploads by helper bots are copied)
+        
+    Returns:
+        list: Chat IDs the delivery failed for
+    """
+    async def deliver(chat_id):
+        async def send():
+            if copy:
+                return await send_scheduler.call(
+                    chat_id,
+                    client.copy_message,
+                    chat_id=chat_id,
+                    from_chat_id=sent.chat.id,
+                    message_id=sent.id,
+                    caption=caption
+                )
+            if sent.video:
+                return await send_scheduler.call(
+                    chat_id,
+                    client.send_video,
+                    chat_id=chat_id,
+                    video=sent.video.file_id,
+                    caption=caption,
+                    supports_streaming=True
+                )
+            return await send_scheduler.call(
+                chat_id,
+                client.send_document,
+                chat_id=chat_id,
+                document=sent.document.file_id,
+                caption=caption
+            )
+        
+        try:
+            await upload_with_retry(send, description=f"delivery to {chat_id}")
+            return None
+        except Exception as e:
+            print(f"Delivery to {chat_id} failed: {e}")
+            return chat_id
+    
+    results = await asyncio.gather(*(deliver(chat_id) for chat_id in destinations))
+    return [chat_id for chat_id in results if chat_id is not None]
+
+async def serve_from_archive(client: Client, entry: dict, destinations: list, caption: str):
+    """
+    Deliver an archived episode with copy_message from the storage channel.
+    Split episodes are copied part by part, in order.
+    
+    Returns:
+        list: Chat IDs the delivery failed for
+    """
+    message_ids = entry['message_ids']
+    captions = part_captions(caption, len(message_ids))
+    
+    async def deliver(chat_id):
+        try:
+            for message_id, part_caption in zip(message_ids, captions):
+                async def send():
+                    return await send_scheduler.call(
+                        chat_id,
+                        client.copy_message,
+                        chat_id=chat_id,
+                        from_chat_id=entry['chat_id'],
+                        message_id=message_id,
+                        caption=part_caption
+                    )
+                
+                await upload_with_retry(send, description=f"archive copy to {chat_id}")
+            return None
+        except Exception as e:
+            print(f"Archive copy to {chat_id} failed: {e}")
+            return chat_id
+    
+    results = await asyncio.gather(*(deliver(chat_id) for chat_id in destinations))
+    return [chat_id for chat_id in results if chat_id is not None]
+
+def build_episode_caption(episode: dict, drama_title: str, size_mb: float):
+    """Caption shown to users for an uploaded episode"""
+    caption = f"**{episode['title']}**\n\n"
+    if drama_title:
+        caption += f"Drama: {drama_title}\n"
+    
+    caption += f"\n"
+    if 'season' in episode:
+        caption += f"Season: {episode['season']}\n"
+    caption += f"Episode: {episode['number']}\n"
+    caption += f"Size: {size_mb:.2f} MB | @kdramahype"
+    return caption
+
+async def start_streaming_upload(stream: StreamingDownload, download: asyncio.Future, reporter: ProgressReporter = None, uploader: ParallelUploader = None):
+    """
+    Start uploading a download in progress once its file is open.
+    
+    Returns:
+        asyncio.Task: The upload task, or None when the file cannot be
+        streamed (unknown or oversized Content-Length, or download already over)
+    """
+    started = asyncio.ensure_future(stream.started.wait())
+    await asyncio.wait([download, started], return_when=asyncio.FIRST_COMPLETED)
+    started.cancel()
+    
+    if download.done() or not stream.streamable:
+        return None
+    
+    async def progress(current, total):
+        if reporter:
+            reporter.report_bytes(current, total, label="📤 Uploading")
+    
+    print(f"🔀 Streaming upload started: {os.path.basename(stream.filepath)}")
+    uploader = uploader or parallel_uploader
+    task = asyncio.create_task(uploader.save_file(stream.filepath, progress=progress, stream=stream))
+    stream.follow(task)
+    # A failed streaming upload is replaced by a normal one; don't warn about it
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    return task
+
+async def download_and_upload_episode(client: Client, message: Message, user_id: int, episode: dict, silent: bool = False, drama_title: str = None, reporter: ProgressReporter = None, destinations: list = None, drama_url: str = None, mirrors: list = None):
     """
     Download episode and upload to Telegram.
+    The file is uploaded once; extra destinations receive it by file_id.
+    With helper bots configured, a helper uploads into the storage channel
+    and this bot copies the message to every destination.
+    In archive mode, episodes already in the storage channel are copied from
+    there without downloading.
     
     Args:
         client: Pyrogram client
@@ -1759,105 +5016,300 @@ async def download_and_upload_episode(client: Client, message: Message, user_id:
         episode: Episode dict with download link
         silent: If True, suppress individual status messages
         drama_title: Optional drama title override (for auto-uploads)
+        reporter: Optional batch ProgressReporter to feed instead of a status message
+        destinations: Chat IDs to deliver to (defaults to the user's upload destination)
+        drama_url: Optional drama page URL override (archive key for auto-uploads)
+        mirrors: Download links already resolved by the batch pipeline
         
     Returns:
         bool: True if successful, False otherwise
     """
     
     settings = get_user_settings(user_id)
-    chat_id = await get_upload_chat_id(user_id)
+    if not destinations:
+        destinations = [await get_upload_chat_id(user_id)]
+    destinations = list(dict.fromkeys(destinations))
+    
+    # Use provided drama title/URL (for auto-uploads) or session data (for manual downloads)
+    session_drama = user_sessions.get(user_id, {}).get('drama')
+    if not drama_title and session_drama:
+        drama_title = session_drama['title']
+    if not drama_url and session_drama:
+        drama_url = session_drama['url']
+    
+    key = None
+    if ARCHIVE_MODE and STORAGE_CHANNEL_ID and drama_url:
+        key = archive_key(drama_url, episode.get('season'), episode['title'])
+    
+    # Upload the bytes once, then fan out to the remaining chats
+    if key or upload_pool.enabled or (STORAGE_CHANNEL_ID and len(destinations) > 1):
+        chat_id = STORAGE_CHANNEL_ID
+        fan_out = destinations
+    else:
+        chat_id = destinations[0]
+        fan_out = destinations[1:]
     
+    status_msg = None
     if not silent:
-        status_msg = await message.reply_text(f"📥 Starting download: {episode['title']}")
-    
-    progress_updates = []
-    
-    def progress_callback(update):
-        progress_updates.append(update)
-    
-    # Download the video
-    result = scraper.extract_and_download(episode['download_link'], progress_callback)
+        status_msg = await send_scheduler.reply_text(message, f"📥 Starting download: {episode['title']}")
+        reporter = ProgressReporter(status_msg, header=f"🎬 **{episode['title']}**").start()
+    
+    async def finish(text):
+        if status_msg:
+            await reporter.stop(text)
+        elif text.startswith("❌"):
+            await send_scheduler.reply_text(message, text)
+    
+    # Serve from the archive when this episode was processed before
+    entry = archive_index.get(key) if key else None
+    if entry:
+        if reporter:
+            reporter("🗄️ Found in archive - delivering...")
+        caption = build_episode_caption(episode, drama_title, entry['size_mb'])
+        failed = await serve_from_archive(client, entry, destinations, caption)
+        if mirrors and len(failed) < len(destinations):
+            scraper.release_mirrors(mirrors)
+        
+        if not failed:
+            await finish(f"✅ Delivered from archive: {episode['title']}")
+            return True
+        if len(failed) < len(destinations):
+            await finish(
+                f"❌ Delivered to {len(destinations) - len(failed)}/{len(destinations)} chats: {episode['title']}\n"
+                f"Failed: {', '.join(str(chat) for chat in failed)}"
+            )
+            return False
+        
+        # Nothing could be copied - the archived message is likely gone
+        print(f"Archive entry unusable, downloading again: {key}")
+        archive_index.pop(key, None)
+        save_archive_index()
+    
+    loop = asyncio.get_running_loop()
+    as_video = settings['upload_as'] == 'video'
+    
+    # Pick who uploads: a helper bot from the pool, or this bot
+    helper = None
+    upload_client, uploader, scheduler = client, parallel_uploader, send_scheduler
+    upload_started = None
+    
+    def release_helper(size=0, error=None):
+        nonlocal helper
+        if helper:
+            elapsed = time.monotonic() - upload_started if upload_started else 0
+            upload_pool.release(helper, size, elapsed, error)
+            helper = None
+    
+    # Reuse a file whose earlier upload failed, otherwise download the video
+    stream_upload = None
+    result = take_parked_upload(episode)
+    if result and mirrors:
+        scraper.release_mirrors(mirrors)
+    if not result and mirrors is None:
+        # Resolved (or resolving) ahead of the click
+        resolving = resolved_links.take(episode['download_link'])
+        if resolving:
+            if reporter:
+                reporter("⚡ Link resolved ahead - starting download...")
+            try:
+                mirrors = await asyncio.wrap_future(resolving) or None
+            except Exception as e:
+                print(f"Speculative resolution failed: {e}")
+    if not result:
+        stream = StreamingDownload(loop, reporter) if STREAMING_UPLOAD else None
+        download = asyncio.ensure_future(
+            asyncio.to_thread(
+                scraper.extract_and_download, episode['download_link'], stream or reporter,
+                episode.get('download_links'), mirrors
+            )
+        )
+        if stream:
+            if upload_pool.enabled:
+                helper = upload_pool.acquire()
+                upload_client, uploader, scheduler = helper.client, helper.uploader, helper.scheduler
+            stream_upload = await start_streaming_upload(stream, download, reporter, uploader=uploader)
+            if stream_upload:
+                upload_started = time.monotonic()
+        try:
+            result = await download
+        finally:
+            if stream:
+                stream.finish()
     
     if not result or not result.get('success'):
-        error_msg = f"❌ Download failed: {episode['title']}"
-        if not silent:
-            await status_msg.edit_text(error_msg)
-        else:
-            await message.reply_text(error_msg)
+        if stream_upload:
+            stream_upload.cancel()
+        release_helper()
+        await finish(f"❌ Download failed: {episode['title']}")
         return False
     
     filepath = result['filepath']
-    filename = result['filename']
     
-    if not silent:
-        await status_msg.edit_text(f"✅ Downloaded!\n📤 Uploading to Telegram...")
+    if reporter:
+        reporter(f"✅ Downloaded {result['size_mb']:.2f} MB\n📤 Uploading to Telegram...")
     
     # Get thumbnail
     thumb_path = None
     if settings['thumbnail_type'] == 'auto':
-        thumb_path = extract_thumbnail_from_video(filepath)
+        thumb_path = await loop.run_in_executor(media_executor, extract_thumbnail_from_video, filepath)
     elif settings['thumbnail_type'] == 'custom':
         thumb_path = settings['custom_thumbnail_path']
     
     # Upload to Telegram
     try:
-        caption = f"**{episode['title']}**\n\n"
-        
-        # Use provided drama_title (for auto-uploads) or session data (for manual downloads)
-        if drama_title:
-            caption += f"Drama: {drama_title}\n"
-        elif user_id in user_sessions and 'drama' in user_sessions[user_id]:
-            caption += f"Drama: {user_sessions[user_id]['drama']['title']}\n"
-        
-        caption += f"\n"
-        if 'season' in episode:
-            caption += f"Season: {episode['season']}\n"
-        caption += f"Episode: {episode['number']}\n"
-        caption += f"Size: {result['size_mb']:.2f} MB | @kdramahype"
-        
-        if settings['upload_as'] == 'video':
-            await client.send_video(
-                chat_id=chat_id,
-                video=filepath,
-                caption=caption,
-                thumb=thumb_path,
-                supports_streaming=True
-            )
-        else:
-            await client.send_document(
-                chat_id=chat_id,
-                document=filepath,
-                caption=caption,
-                thumb=thumb_path
-            )
+        caption = build_episode_caption(episode, drama_title, result['size_mb'])
+        
+        # Split episodes over the bot upload limit
+        parts = None
+        if os.path.getsize(filepath) > TELEGRAM_UPLOAD_LIMIT:
+            if reporter:
+                reporter(f"✂️ File exceeds {TELEGRAM_UPLOAD_LIMIT // (1024 * 1024)} MB - splitting...")
+            # The parts need as much room again as the file itself
+            await asyncio.to_thread(disk_admission.reserve, filepath + ".split", os.path.getsize(filepath), reporter, held=[filepath])
+            parts = await loop.run_in_executor(media_executor, split_for_upload, filepath, as_video)
+        
+        captions = part_captions(caption, len(parts) if parts else 1)
+        upload_captions = captions
+        if key:
+            upload_captions = [
+                part_caption + archive_tag(drama_url, episode, index, len(captions))
+                for index, part_caption in enumerate(captions, 1)
+            ]
+        
+        # Use the upload that ran alongside the download if it completed
+        input_files = None
+        if stream_upload and not parts:
+            await asyncio.wait([stream_upload])
+            if stream_upload.cancelled():
+                print("Streaming upload dropped: the download switched files")
+            elif stream_upload.exception():
+                print(f"Streaming upload failed, uploading again: {stream_upload.exception()}")
+            elif filepath == stream.upload_path and os.path.getsize(filepath) == stream.upload_size:
+                input_files = [stream_upload.result()]
+            stream_upload = None
+        
+        if upload_pool.enabled and not helper:
+            helper = upload_pool.acquire()
+            upload_client, uploader, scheduler = helper.client, helper.uploader, helper.scheduler
+        if not input_files:
+            upload_started = time.monotonic()
+        
+        sent_parts = await upload_parts(
+            upload_client, chat_id, parts or [filepath], upload_captions,
+            as_video=as_video,
+            thumb_path=thumb_path,
+            reporter=reporter,
+            input_files=input_files,
+            uploader=uploader,
+            scheduler=scheduler
+        )
+        release_helper(os.path.getsize(filepath))
         
-        if not silent:
-            await status_msg.edit_text(f"✅ Upload complete: {episode['title']}")
+        if key:
+            record_archive_entry(key, sent_parts, result['size_mb'])
         
-        # Cleanup
-        if os.path.exists(filepath):
+        # Cleanup - the bytes are on Telegram now (stored files stay for reuse)
+        if os.path.exists(filepath) and not download_store.owns(filepath):
             os.remove(filepath)
-        if thumb_path and settings['thumbnail_type'] == 'auto' and os.path.exists(thumb_path):
-            os.remove(thumb_path)
+        discard_parked_upload(episode['download_link'])
+        
+        failed = set()
+        if fan_out:
+            if reporter:
+                reporter(f"📨 Delivering to {len(fan_out)} more chat(s)...")
+            for sent, part_caption in zip(sent_parts, captions):
+                failed.update(await fan_out_upload(client, sent, fan_out, part_caption, copy=upload_client is not client))
+        
+        if failed:
+            await finish(
+                f"❌ Delivered to {len(destinations) - len(failed)}/{len(destinations)} chats: {episode['title']}\n"
+                f"Failed: {', '.join(str(chat) for chat in failed)}"
+            )
+            return False
+        
+        await finish(f"✅ Upload complete: {episode['title']}")
         
         return True
         
     except Exception as e:
-        error_msg = f"❌ Upload failed: {str(e)}"
-        if not silent:
-            await status_msg.edit_text(error_msg)
-        else:
-            await message.reply_text(error_msg)
+        release_helper(error=e)
         
-        # Cleanup
-        if os.path.exists(filepath):
-            os.remove(filepath)
+        # Keep the file so the next attempt only redoes the upload
+        try:
+            park_failed_upload(episode, result)
+        except Exception as park_error:
+            print(f"Could not park failed upload: {park_error}")
+        
+        await finish(
+            f"❌ Upload failed: {str(e)}\n"
+            f"♻️ File kept for {UPLOAD_RETRY_TTL // 3600}h - retrying will skip the download"
+        )
         
         return False
+    
+    finally:
+        if stream_upload:
+            stream_upload.cancel()
+        release_helper()
+        download_store.release(filepath)
+        remove_split_parts(filepath)
+        disk_admission.release(filepath)
+        disk_admission.release(filepath + ".split")
+        if thumb_path and settings['thumbnail_type'] == 'auto' and os.path.exists(thumb_path):
+            os.remove(thumb_path)
 
 
 
 
+batch_download_slots = asyncio.Semaphore(BATCH_DOWNLOADS)
+
+async def run_episode_batch(episodes: list, deliver):
+    """
+    Resolve and deliver a batch of episodes as a two-stage pipeline.
+    Up to RESOLVE_WORKERS episodes wait out their file host countdowns at
+    once, each on its own session and cookie jar (speculative resolutions
+    already running are taken over); resolved episodes are handed to
+    deliver as they resolve, BATCH_DOWNLOADS at a time, and are downloaded
+    on the session they were resolved on. Resolution only runs
+    RESOLVE_WORKERS episodes ahead of the downloads, so links don't expire
+    while they queue.
+    
+    Args:
+        episodes: Episode dicts
+        deliver: Coroutine function (episode, mirrors) -> bool; mirrors is
+            None when the episode was not resolved ahead (e.g. already stored)
+        
+    Returns:
+        list: deliver's results, in episode order
+    """
+    lookahead = asyncio.Semaphore(RESOLVE_WORKERS)
+    
+    async def resolve(episode):
+        await lookahead.acquire()
+        if await asyncio.to_thread(download_store.contains, episode['download_link']):
+            return None
+        return await asyncio.wrap_future(resolved_links.claim(episode))
+    
+    async def run(episode, resolving):
+        # Countdowns are waited out before taking a download slot, so the
+        # slots keep downloading while later episodes resolve
+        try:
+            mirrors = await resolving
+        except Exception as e:
+            print(f"Resolving {episode['title']} failed: {e}")
+            mirrors = []
+        try:
+            await batch_download_slots.acquire()
+        finally:
+            lookahead.release()
+        try:
+            return await deliver(episode, mirrors)
+        finally:
+            batch_download_slots.release()
+    
+    resolving = [asyncio.ensure_future(resolve(episode)) for episode in episodes]
+    return await asyncio.gather(*(run(episode, task) for episode, task in zip(episodes, resolving)))
+
 async def download_all_episodes(client: Client, callback_query):
     """Download all episodes from all seasons"""
     user_id = callback_query.from_user.id
@@ -1870,21 +5322,24 @@ async def download_all_episodes(client: Client, callback_query):
     
     total = len(all_episodes)
     
-    status_msg = await callback_query.message.reply_text(
+    status_msg = await send_scheduler.reply_text(callback_query.message,
         f"📥 **Downloading All Episodes**\n\n"
         f"Drama: {drama['title']}\n"
         f"Total: {total} episodes\n\n"
         f"Progress: 0/{total}"
     )
+    reporter = ProgressReporter(status_msg).start()
     
     success_count = 0
+    done = 0
     
-    for idx, episode in enumerate(all_episodes, 1):
-        await status_msg.edit_text(
+    async def deliver(episode, mirrors):
+        nonlocal success_count, done
+        reporter.set_header(
             f"📥 **Downloading**\n\n"
             f"Drama: {drama['title']}\n"
-            f"Progress: {idx}/{total}\n"
-            f"Success: {success_count}/{idx-1}\n\n"
+            f"Progress: {done + 1}/{total}\n"
+            f"Success: {success_count}/{done}\n\n"
             f"Current: {episode['title']}"
         )
         
@@ -1893,13 +5348,19 @@ async def download_all_episodes(client: Client, callback_query):
             callback_query.message, 
             user_id, 
             episode, 
-            silent=True
+            silent=True,
+            reporter=reporter,
+            mirrors=mirrors
         )
         
+        done += 1
         if success:
             success_count += 1
+        return success
     
-    await status_msg.edit_text(
+    await run_episode_batch(all_episodes, deliver)
+    
+    await reporter.stop(
         f"✅ **Download Complete!**\n\n"
         f"Drama: {drama['title']}\n"
         f"Total: {total} episodes\n"
@@ -1921,7 +5382,7 @@ async def add_to_monitor(client: Client, callback_query):
     # Check if already monitoring
     for monitored in monitor_data[user_id]:
         if monitored['url'] == drama['url']:
-            await callback_query.message.reply_text("⚠️ You're already monitoring this drama!")
+            await send_scheduler.reply_text(callback_query.message, "⚠️ You're already monitoring this drama!")
             return
     
     total_episodes = sum(len(eps) for eps in episodes.values())
@@ -1937,7 +5398,7 @@ async def add_to_monitor(client: Client, callback_query):
     monitor_data[user_id].append(monitor_entry)
     save_monitor_data()
     
-    await callback_query.message.reply_text(
+    await send_scheduler.reply_text(callback_query.message,
         f"✅ **Monitoring Added**\n\n"
         f"Drama: {drama['title']}\n"
         f"Current Episodes: {total_episodes}\n"
@@ -1949,64 +5410,101 @@ async def add_to_monitor(client: Client, callback_query):
 # Background Monitoring Task
 # ============================================================================
 
+async def cleanup_upload_retry_area():
+    """Background task that garbage-collects expired parked uploads"""
+    while True:
+        try:
+            cleanup_expired_uploads()
+        except Exception as e:
+            print(f"Retry area cleanup error: {e}")
+        await asyncio.sleep(600)
+
+async def rebuild_archive_on_startup():
+    """Rebuild a missing archive index once the client is connected"""
+    await asyncio.sleep(10)
+    try:
+        count = await rebuild_archive_index(app)
+        print(f"🗄️ Archive index rebuilt: {count} episodes")
+    except Exception as e:
+        print(f"Archive rebuild error: {e}")
+
 async def check_monitored_dramas():
     """Background task to check for new episodes in monitored dramas"""
     while True:
         try:
             await asyncio.sleep(3600)  # Check every hour
             
-            for user_id, dramas in monitor_data.items():
-                settings = get_user_settings(user_id)
-                
+            # Group subscriptions by drama so each page is scraped once and
+            # each new episode is uploaded once for all of its destinations
+            subscriptions = {}
+            for user_id, dramas in list(monitor_data.items()):
                 for drama in dramas:
-                    try:
-                        # Scrape current episodes
-                        current_episodes = scraper.scrape_episodes(drama['url'])
-                        current_total = sum(len(eps) for eps in current_episodes.values())
-                        
+                    subscriptions.setdefault(drama['url'], []).append((user_id, drama))
+            
+            for drama_url, subscribers in subscriptions.items():
+                try:
+                    # Scrape current episodes
+                    current_episodes = await asyncio.to_thread(scraper.scrape_episodes, drama_url)
+                    current_total = sum(len(eps) for eps in current_episodes.values())
+                    
+                    all_current = []
+                    for season_eps in current_episodes.values():
+                        all_current.extend(season_eps)
+                    
+                    # Episode index -> subscribers that still need it
+                    pending = {}
+                    
+                    for user_id, drama in subscribers:
                         # Check if new episodes found
+                        if current_total <= drama['episode_count']:
+                            continue
+                        
+                        new_count = current_total - drama['episode_count']
+                        
+                        await send_scheduler.send_message(
+                            app,
+                            user_id,
+                            f"🆕 **New Episodes Detected!**\n\n"
+                            f"Drama: {drama['title']}\n"
+                            f"New Episodes: {new_count}\n"
+                            f"Total Now: {current_total}"
+                        )
+                        
+                        # Auto-download if enabled
+                        if get_user_settings(user_id)['monitor_auto_upload']:
+                            for index in range(drama['episode_count'], current_total):
+                                pending.setdefault(index, []).append((user_id, drama))
+                    
+                    new_episodes = [all_current[index] for index in sorted(pending)]
+                    waiting = {all_current[index]['download_link']: pending[index] for index in pending}
+                    
+                    async def deliver(episode, mirrors):
+                        episode_subscribers = waiting[episode['download_link']]
+                        owner_id, owner_drama = episode_subscribers[0]
+                        
+                        return await download_and_upload_episode(
+                            app,
+                            await send_scheduler.send_message(app, owner_id, "Processing..."),
+                            owner_id,
+                            episode,
+                            silent=True,
+                            drama_title=owner_drama['title'],  # Pass the correct drama title!
+                            drama_url=drama_url,
+                            destinations=[drama['upload_destination']['id'] for _, drama in episode_subscribers],
+                            mirrors=mirrors
+                        )
+                    
+                    await run_episode_batch(new_episodes, deliver)
+                    
+                    # Update counts
+                    for user_id, drama in subscribers:
                         if current_total > drama['episode_count']:
-                            new_count = current_total - drama['episode_count']
-                            
-                            await app.send_message(
-                                user_id,
-                                f"🆕 **New Episodes Detected!**\n\n"
-                                f"Drama: {drama['title']}\n"
-                                f"New Episodes: {new_count}\n"
-                                f"Total Now: {current_total}"
-                            )
-                            
-                            # Auto-download if enabled
-                            if settings['monitor_auto_upload']:
-                                # Temporarily set upload destination from monitor data
-                                if user_id not in user_sessions:
-                                    user_sessions[user_id] = {}
-                                user_sessions[user_id]['upload_destination'] = drama['upload_destination']
-                                
-                                # Get new episodes
-                                all_current = []
-                                for season_eps in current_episodes.values():
-                                    all_current.extend(season_eps)
-                                
-                                new_episodes = all_current[drama['episode_count']:]
-                                
-                                for episode in new_episodes:
-                                    await download_and_upload_episode(
-                                        app,
-                                        await app.send_message(user_id, "Processing..."),
-                                        user_id,
-                                        episode,
-                                        silent=True,
-                                        drama_title=drama['title']  # Pass the correct drama title!
-                                    )
-                            
-                            # Update count
                             drama['episode_count'] = current_total
-                            save_monitor_data()
-                    
-                    except Exception as e:
-                        print(f"Error checking drama {drama['title']}: {e}")
-                        continue
+                    save_monitor_data()
+                
+                except Exception as e:
+                    print(f"Error checking drama {subscribers[0][1]['title']}: {e}")
+                    continue
         
         except Exception as e:
             print(f"Monitor task error: {e}")
@@ -2020,6 +5518,9 @@ async def check_monitored_dramas():
 async def on_disconnect(client):
     """Save data on disconnect"""
     save_monitor_data()
+    save_pending_uploads()
+    if selector_stats.dirty:
+        selector_stats.save()
     print("Bot disconnected - data saved")
 
 if __name__ == "__main__":
@@ -2031,8 +5532,33 @@ if __name__ == "__main__":
     load_monitor_data()
     print(f"Loaded {sum(len(dramas) for dramas in monitor_data.values())} monitored dramas")
     
-    # Start monitoring background task
+    # Load uploads that failed before the last shutdown
+    load_pending_uploads()
+    print(f"Loaded {len(pending_uploads)} parked uploads")
+    
+    # Load extraction strategy stats
+    selector_stats.load()
+    countdown_timings.load()
+    
+    # Load the download store
+    download_store.load()
+    print(f"Loaded {len(download_store.entries)} stored downloads")
+    
+    # Load the storage channel archive
+    load_archive_index()
+    print(f"Loaded {len(archive_index)} archived episodes")
+    
+    # Start background tasks
     asyncio.get_event_loop().create_task(check_monitored_dramas())
+    asyncio.get_event_loop().create_task(cleanup_upload_retry_area())
+    if ARCHIVE_MODE and STORAGE_CHANNEL_ID and not archive_index:
+        asyncio.get_event_loop().create_task(rebuild_archive_on_startup())
+    if upload_pool.bots:
+        asyncio.get_event_loop().create_task(upload_pool.start())
     
     print("✅ Bot is running!\n")
     app.run()
+    
+    # Stop the helper bots on the loop they were started on
+    if upload_pool.bots:
+        app.run(upload_pool.stop())
@@ -0,0 +1,78 @@
+"""
+Benchmark the HTML parser backends used by nkiribotv4.
+
+Times parsing plus episode extraction on each installed backend; bs4 is
+also timed with the episode page's parse scope (the only backend that
+applies it).
+Pass saved pages or URLs to benchmark real pages; without arguments a
+synthetic drama page with many Elementor containers is used.
+
+Usage:
+    python parser_benchmark.py [page.html | URL ...] [-n ROUNDS]
+"""
+import sys
+import time
+
+import requests
+
+from nkiribotv4 import DramaEpisodeScraper, EPISODE_PAGE_SCOPE, available_html_backends, parse_html
+
+def synthetic_drama_page(seasons=4, episodes=24):
+    """Drama page shaped like thenkiri's Elementor layout"""
+    blocks = []
+    for season in range(1, seasons + 1):
+        blocks.append(
+            '<div class="elementor-container elementor-column-gap-default">'
+            f'<h2 class="elementor-heading-title">Season {season}</h2></div>'
+        )
+        for episode in range(1, episodes + 1):
+            blocks.append(
+                '<div class="elementor-container elementor-column-gap-default">'
+                '<div class="elementor-column"><div class="elementor-widget-wrap">'
+                f'<h2 class="elementor-heading-title">Episode {episode}</h2>'
+                '<p>Lorem ipsum dolor sit amet, consectetur adipiscing elit.</p>'
+                f'<a class="elementor-button elementor-size-sm" href="https://downloadwella.com/x{season}{episode}/ep.mkv.html">'
+                '<span class="elementor-button-text">Download</span></a>'
+                '</div></div></div>'
+            )
+    filler = '<nav><ul>' + ''.join(f'<li><a href="/page/{i}">Link {i}</a></li>' for i in range(300)) + '</ul></nav>'
+    return f'<html><head><title>Drama</title></head><body>{filler}{"".join(blocks)}{filler}</body></html>'.encode()
+
+def load_page(source):
+    if source.startswith('http'):
+        response = requests.get(source, verify=False, timeout=30)
+        response.raise_for_status()
+        return response.content
+    with open(source, 'rb') as f:
+        return f.read()
+
+def benchmark(name, content, rounds):
+    scraper = DramaEpisodeScraper()
+    print(f"\n{name} ({len(content) / 1024:.0f} KB, {rounds} rounds)")
+
+    baseline = None
+    for backend in reversed(available_html_backends()):
+        for scope in (None, EPISODE_PAGE_SCOPE) if backend == 'bs4' else (None,):
+            started = time.perf_counter()
+            for _ in range(rounds):
+                soup = parse_html(content, backend, scope=scope)
+                episodes = scraper.parse_elementor_episodes_by_season(soup)
+            elapsed = (time.perf_counter() - started) / rounds
+
+            baseline = baseline or elapsed
+            count = sum(len(eps) for eps in episodes.values())
+            label = f"{backend}{' (scoped)' if scope else ''}"
+            print(f"  {label:<20} {elapsed * 1000:8.2f} ms/page  {baseline / elapsed:5.1f}x  ({count} episodes)")
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    rounds = 20
+    if '-n' in args:
+        index = args.index('-n')
+        rounds = int(args[index + 1])
+        del args[index:index + 2]
+
+    if not args:
+        benchmark("synthetic drama page", synthetic_drama_page(), rounds)
+    for source in args:
+        benchmark(source, load_page(source), rounds)
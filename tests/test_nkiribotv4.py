@@ -0,0 +1,306 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+from pyrogram.parser import Parser
+
+import nkiribotv4 as bot
+
+# Free space never reaches this margin, so only the unconditional
+# admission rules let a reservation through
+UNREACHABLE_MARGIN = 10 ** 18
+
+
+def reserve_in_thread(admission, *args, **kwargs):
+    """Start a reservation in a daemon thread; returns an Event set once admitted"""
+    admitted = threading.Event()
+
+    def run():
+        admission.reserve(*args, **kwargs)
+        admitted.set()
+
+    threading.Thread(target=run, daemon=True).start()
+    return admitted
+
+
+# ----------------------------------------------------------------------------
+# Disk admission
+# ----------------------------------------------------------------------------
+def test_admission_admits_first_job_even_without_space(tmp_path):
+    admission = bot.DiskAdmission(str(tmp_path), 0, UNREACHABLE_MARGIN)
+    assert reserve_in_thread(admission, "a.mkv", 100).wait(2)
+
+
+def test_admission_queues_job_behind_other_reservations(tmp_path):
+    admission = bot.DiskAdmission(str(tmp_path), 0, UNREACHABLE_MARGIN)
+    admission.reserve("a.mkv", 100)
+    admitted = reserve_in_thread(admission, "b.mkv", 100)
+    assert not admitted.wait(0.5)
+    admission.release("a.mkv")
+    assert admitted.wait(12)
+
+
+def test_admission_top_up_does_not_wait_on_own_reservation(tmp_path):
+    admission = bot.DiskAdmission(str(tmp_path), 0, UNREACHABLE_MARGIN)
+    admission.reserve("a.mkv", 100)
+    assert reserve_in_thread(admission, "a.mkv", 50, held=["a.mkv"]).wait(2)
+    assert admission.reservations["a.mkv"] == 150
+
+
+def test_admission_split_reservation_counts_own_file(tmp_path):
+    admission = bot.DiskAdmission(str(tmp_path), 0, UNREACHABLE_MARGIN)
+    admission.reserve("a.mkv", 100)
+    assert reserve_in_thread(admission, "a.mkv.split", 100, held=["a.mkv"]).wait(2)
+
+
+def test_admission_top_up_goes_ahead_of_queued_jobs(tmp_path):
+    # b waits for the space a will free; a's top-up must not queue behind b
+    admission = bot.DiskAdmission(str(tmp_path), 0, UNREACHABLE_MARGIN)
+    admission.reserve("a.mkv", 100)
+    queued = reserve_in_thread(admission, "b.mkv", 100)
+    time.sleep(0.2)
+    assert reserve_in_thread(admission, "a.mkv", 50, held=["a.mkv"]).wait(2)
+    assert not queued.is_set()
+
+
+def test_admission_jobs_waiting_on_each_other_are_admitted(tmp_path):
+    admission = bot.DiskAdmission(str(tmp_path), 0, UNREACHABLE_MARGIN)
+    admission.reserve("a.mkv", 100)
+    admission.reservations["b.mkv"] = 100  # admitted while there was room
+    a_top_up = reserve_in_thread(admission, "a.mkv", 50, held=["a.mkv"])
+    time.sleep(0.2)
+    b_top_up = reserve_in_thread(admission, "b.mkv", 50, held=["b.mkv"])
+    assert b_top_up.wait(2)
+    admission.release("b.mkv")
+    assert a_top_up.wait(12)
+
+
+def test_admission_reclaims_cache_space(tmp_path):
+    free = bot.shutil.disk_usage(str(tmp_path)).free
+    admission = bot.DiskAdmission(str(tmp_path), 0, free)
+    admission.reserve("a.mkv", 0)
+    requested = []
+
+    def reclaim(needed):
+        requested.append(needed)
+        return needed
+
+    admission.reclaim = reclaim
+    # The hook is asked for the shortfall; the disk itself did not change
+    assert not admission._fits(1024)
+    assert requested and requested[0] >= 1024
+
+
+# ----------------------------------------------------------------------------
+# Download names and the download store
+# ----------------------------------------------------------------------------
+def test_claim_file_path_gives_concurrent_jobs_distinct_names(tmp_path):
+    paths = []
+    threads = [
+        threading.Thread(target=lambda: paths.append(bot.claim_file_path(str(tmp_path), "ep.mkv")))
+        for _ in range(20)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(paths)) == 20
+    assert sorted(os.listdir(tmp_path))[:2] == ["ep.mkv", "ep_1.mkv"]
+
+
+def test_claim_file_path_never_truncates_existing_file(tmp_path):
+    existing = tmp_path / "ep.mkv"
+    existing.write_bytes(b"data")
+    path = bot.claim_file_path(str(tmp_path), "ep.mkv")
+    assert path == str(tmp_path / "ep_1.mkv")
+    assert existing.read_bytes() == b"data"
+
+
+def make_store(tmp_path, monkeypatch, budget=10 ** 12):
+    monkeypatch.setattr(bot, "DOWNLOAD_PATH", str(tmp_path))
+    return bot.DownloadStore(str(tmp_path / "store"), str(tmp_path / "store.json"), budget)
+
+
+def add_download(store, tmp_path, name, content, alias):
+    path = tmp_path / name
+    path.write_bytes(content)
+    digest = bot.hashlib.sha256(content).hexdigest()
+    result = {'success': True, 'filepath': str(path), 'filename': name, 'size_mb': 0, 'sha256': digest}
+    return store.add(result, aliases=[alias])
+
+
+def test_store_reclaim_evicts_only_files_not_in_use(tmp_path, monkeypatch):
+    store = make_store(tmp_path, monkeypatch)
+    for index in range(3):
+        stored = add_download(store, tmp_path, f"ep{index}.mkv", bytes([index]) * 1000, f"link{index}")
+        if index != 1:
+            store.release(stored['filepath'])
+    assert store.reclaim(1500) == 2000
+    assert store.contains("link1")
+    assert not store.contains("link0") and not store.contains("link2")
+
+
+def test_store_lookup_relinks_a_deleted_name(tmp_path, monkeypatch):
+    store = make_store(tmp_path, monkeypatch)
+    stored = add_download(store, tmp_path, "ep.mkv", b"video", "link")
+    store.release(stored['filepath'])
+    os.remove(stored['filepath'])
+    found = store.lookup("link")
+    assert found['filepath'] == str(tmp_path / "ep.mkv")
+    assert not found['filepath'].startswith(store.objects_path)
+
+
+# ----------------------------------------------------------------------------
+# Split parts
+# ----------------------------------------------------------------------------
+def test_list_split_parts_matches_only_generated_names(tmp_path):
+    names = [
+        "Ep 1 (x).mkv", "Ep 1 (x).part000.mkv", "Ep 1 (x).part001.mkv", "Ep 1 (x).mkv.001",
+        "Ep 1 (x).mkv.srt", "Ep 1 (x).mkv.part", "Ep 1 (x).thumb.jpg",
+    ]
+    for name in names:
+        (tmp_path / name).write_bytes(b"")
+    parts = [os.path.basename(part) for part in bot.list_split_parts(str(tmp_path / "Ep 1 (x).mkv"))]
+    assert parts == ["Ep 1 (x).mkv.001", "Ep 1 (x).part000.mkv", "Ep 1 (x).part001.mkv"]
+
+
+def test_split_file_by_bytes_names_parts_after_the_file(tmp_path):
+    path = tmp_path / "ep.mkv"
+    path.write_bytes(b"x" * 25)
+    parts = bot.split_file_by_bytes(str(path), part_size=10)
+    assert [os.path.basename(part) for part in parts] == ["ep.mkv.001", "ep.mkv.002", "ep.mkv.003"]
+    assert bot.list_split_parts(str(path)) == parts
+
+
+# ----------------------------------------------------------------------------
+# Container sniffing
+# ----------------------------------------------------------------------------
+TS_PACKET = b"\x47" + b"\x00" * 187
+
+
+@pytest.mark.parametrize("data, expected", [
+    (b"\x1a\x45\xdf\xa3" + b"\x00" * 20, 'mkv'),
+    (b"\x00\x00\x00\x18ftypmp42", 'mp4'),
+    (b"RIFF\x00\x00\x00\x00AVI LIST", 'avi'),
+    (TS_PACKET * 3, 'ts'),
+    (TS_PACKET + b"\x47", 'ts'),
+    (TS_PACKET, None),
+    (b"GET / HTTP/1.1", None),
+    (TS_PACKET + b"x" * 188, None),
+    (b"\xef\xbb\xbf  <!DOCTYPE html>", 'html'),
+], ids=[
+    "mkv", "mp4", "avi", "ts", "ts-two-syncs", "ts-one-packet", "text-starting-with-G",
+    "ts-broken-sync", "html-with-bom",
+])
+def test_sniff_video_container(data, expected):
+    assert bot.sniff_video_container(data) == expected
+
+
+# ----------------------------------------------------------------------------
+# Countdown timings
+# ----------------------------------------------------------------------------
+def test_countdown_probe_starts_midway_and_learns_fractions(tmp_path):
+    timings = bot.CountdownTimings(str(tmp_path / "countdown.json"))
+    assert timings.probe_wait("host", 10) == 5
+    timings.record("host", 6, 10, True)
+    timings.record("host", 3, 10, False)
+    # Learned as shares of the countdown, so a longer countdown scales
+    assert timings.probe_wait("host", 20) == pytest.approx(9)
+    assert timings.probe_wait("host", 10) == pytest.approx(4.5)
+
+
+def test_countdown_probe_settles_within_resolution(tmp_path):
+    timings = bot.CountdownTimings(str(tmp_path / "countdown.json"))
+    timings.record("host", 5, 10, True)
+    timings.record("host", 4.5, 10, False)
+    assert timings.probe_wait("host", 10) == pytest.approx(5)
+
+
+def test_countdown_newest_observation_wins(tmp_path):
+    timings = bot.CountdownTimings(str(tmp_path / "countdown.json"))
+    timings.record("host", 6, 10, True)
+    timings.record("host", 7, 10, False)
+    assert 'min_accepted_fraction' not in timings.stats["host"]
+
+
+def test_countdown_rejections_fade(tmp_path):
+    timings = bot.CountdownTimings(str(tmp_path / "countdown.json"), rejection_half_life=10)
+    timings.record("host", 8, 10, False)
+    timings.stats["host"]['rejected_at'] -= 10
+    assert timings._rejected(timings.stats["host"]) == pytest.approx(0.4, abs=0.01)
+
+
+# ----------------------------------------------------------------------------
+# Resolved link cache
+# ----------------------------------------------------------------------------
+def test_resolved_links_purges_expired_entries_on_insert(monkeypatch):
+    released = []
+    monkeypatch.setattr(bot.scraper, "release_mirrors", released.append)
+    links = bot.ResolvedLinks(None)
+    monkeypatch.setattr(links, "_submit", lambda episode: Future())
+    resolved = Future()
+    resolved.set_result(["mirror"])
+    links.entries["old"] = {'future': resolved, 'expires': time.monotonic() - 1}
+    links.entries["fresh"] = {'future': Future(), 'expires': None}
+
+    links.resolve({'download_link': "new"})
+
+    assert sorted(links.entries) == ["fresh", "new"]
+    assert released == [["mirror"]]
+
+
+def test_resolved_links_take_hands_over_once(monkeypatch):
+    links = bot.ResolvedLinks(None)
+    monkeypatch.setattr(links, "_submit", lambda episode: Future())
+    future = links.resolve({'download_link': "link"})
+    assert links.take("link") is future
+    assert links.take("link") is None
+
+
+# ----------------------------------------------------------------------------
+# Archive tags
+# ----------------------------------------------------------------------------
+def test_archive_tag_round_trips_through_caption_parsing():
+    drama_url = "https://example.com/a__b--c?d=1&e=2"
+    episode = {'title': "Ep `1` <Finale> & __x__ **y** [a](b)", 'season': None}
+    caption = "**Caption**" + bot.archive_tag(drama_url, episode, 1, 2)
+
+    text = asyncio.run(Parser(None).parse(caption, None))['message']
+    match = bot.ARCHIVE_TAG_PATTERN.search(text)
+
+    key = bot.archive_key(match.group('url'), match.group('season'), match.group('title'))
+    assert key == bot.archive_key(drama_url, episode['season'], episode['title'])
+    assert match.group('part') == "1" and match.group('parts') == "2"
+
+
+# ----------------------------------------------------------------------------
+# Extraction strategy tiers
+# ----------------------------------------------------------------------------
+def test_strategy_order_ranks_only_within_tiers(tmp_path):
+    stats = bot.StrategyStats(str(tmp_path / "stats.json"))
+    tiers = bot.DramaPageParser.COUNTDOWN_TIERS
+    for _ in range(5):
+        stats.record('countdown', "host", ['script'], 'script')
+        stats.record('countdown', "host", ['span.seconds', '#countdown', '.countdown'], '.countdown')
+    order = stats.order('countdown', "host", tiers)
+    assert order[0] == '.countdown'
+    assert order[-1] == 'script'
+    assert sorted(order) == sorted(bot.DramaPageParser.COUNTDOWN_STRATEGIES)
+
+
+def test_episode_containers_match_exact_class_only():
+    page = b'''<html><body>
+        <div class="elementor-container elementor-column-gap-default">
+            <h2 class="elementor-heading-title">Season 1</h2>
+        </div>
+        <div class="elementor-container elementor-column-gap-default extra">
+            <h2 class="elementor-heading-title">Season 2</h2>
+        </div>
+    </body></html>'''
+    selector = 'div[class="elementor-container elementor-column-gap-default"]'
+    for backend in ['bs4', 'lxml', 'selectolax']:
+        soup = bot.parse_html(page, backend=backend, scope=bot.EPISODE_PAGE_SCOPE)
+        assert len(soup.select(selector)) == 1, backend